@@ -1,12 +1,26 @@
+import base64
+import orjson
 from fastapi import APIRouter, Query, HTTPException
-from typing import Optional
+from fastapi.responses import ORJSONResponse, Response
+from typing import Literal, Optional
 from pydantic import HttpUrl
 
 from app.infrastructure.pg.dao import pg_get_by_url, pg_recent_candidates
+from app.infrastructure.bitpack import pack_phash64_u64, pack_rows_u64_bytes, unpack_phash64, unpack_bool_bits
+from app.infrastructure.content_cache import TTLCache
 from app.application.services.retention_cleanup import RetentionCleaner
 from app.infrastructure.settings import get_settings
 
-router = APIRouter(tags=["_dev"])
+class NPORJSONResponse(ORJSONResponse):
+    """ORJSONResponse que serializa np.ndarray directamente (sin `.tolist()`)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+router = APIRouter(tags=["_dev"], default_response_class=NPORJSONResponse)
+
+# (campaign_id, limit) -> JSON ya serializado del listado de recientes (polling de dashboards).
+_RECENT_LISTING_CACHE = TTLCache(maxsize=256, ttl_s=10.0)
 
 """
 Endpoints de soporte (DEV/QA) – PG-only:
@@ -14,13 +28,27 @@ Endpoints de soporte (DEV/QA) – PG-only:
 - Útil para validar persistencia, tamaños y formas sin devolver arrays gigantes por defecto.
 """
 
+def _recent_item(it: dict) -> dict:
+    """Entrada liviana del listado de recientes (sin arrays)."""
+
+    return {
+        "video_id": it["video_id"],
+        "url": it["url"],
+        "duration_s": it["duration_s"],
+        "phash_bits": it.get("phash_bits", 64),
+        "seq_bits_shape": [it.get("seq_rows", 0), it.get("seq_cols", 0)],
+        "created_at": it.get("created_at"),
+    }
+
+
 @router.get(
     "/_dev/features",
     summary="Inspección de features en Postgres",
     description=(
         "Lee features por `url` o lista `limit` recientes de una campaña, **desde Postgres**.\n\n"
         "**Cuando pasas `url`:**\n"
-        "- Devuelve tamaños/shape y, en `raw`, los arrays ya decodificados (¡sólo para QA!).\n\n"
+        "- Devuelve tamaños/shape y, en `raw`, los bits empaquetados (`np.packbits`, big-endian) en base64.\n"
+        "- `format=list` devuelve los arrays como listas JSON (formato legado, ¡sólo para QA!).\n\n"
         "**Cuando NO pasas `url`:**\n"
         "- Lista hasta `limit` recientes (sin arrays) para payloads livianos."
     ),
@@ -32,11 +60,13 @@ Endpoints de soporte (DEV/QA) – PG-only:
 def dev_features(
     campaign_id: str = Query(..., description="ID de campaña"),
     url: Optional[HttpUrl] = Query(None, description="URL exacta del video"),
-    limit: int = Query(10, ge=1, le=100, description="Cuántos recientes listar si no pasas URL")
+    limit: int = Query(10, ge=1, le=100, description="Cuántos recientes listar si no pasas URL"),
+    format: Literal["bits", "list"] = Query("bits", description="`bits`: base64 empaquetado; `list`: arrays JSON (legado)"),
 ):
     """
     Devuelve features guardadas en Postgres.
-    - Si `url` existe: retorna huella completa (tamaños + `raw` con arrays decodificados).
+    - Si `url` existe: retorna huella completa (tamaños + `raw` con bits empaquetados en base64,
+      o arrays decodificados si `format=list`).
     - Si NO hay `url`: lista recientes (sin arrays grandes).
     """
     if url:
@@ -44,36 +74,49 @@ def dev_features(
         if not rec:
             raise HTTPException(status_code=404, detail="No hay features en Postgres para esa URL.")
 
-        ph = rec.get("phash64", [])
-        seq = rec.get("seq_sig", [])
-        phash_len = len(ph)
-        seq_shape = [len(seq), len(seq[0]) if len(seq) > 0 else 0]
+        # El DAO sólo trae las formas empaquetadas; los bytes son los mismos que guarda Postgres.
+        ph_bytes = pack_phash64_u64(rec["phash64_u64"])
+        seq_bytes = pack_rows_u64_bytes(rec["seq_u64"])
+        # Shape guardado junto al blob empaquetado (no hace falta inspeccionar el array).
+        seq_shape = [rec["seq_rows"], rec["seq_cols"]]
 
-        ph_json = ph.tolist() if hasattr(ph, "tolist") else ph
-        seq_json = seq.tolist() if hasattr(seq, "tolist") else seq
+        if format == "list":
+            # np.ndarray tal cual: NPORJSONResponse los codifica en C. Se devuelve la respuesta
+            # armada (ver abajo) para que FastAPI no pase los arrays por `jsonable_encoder`.
+            raw = {
+                "phash64": unpack_phash64(ph_bytes),
+                "seq_sig": unpack_bool_bits(seq_bytes, rec["seq_rows"], rec["seq_cols"]),
+            }
+        else:
+            # Mismo empaquetado que en Postgres: un buffer contiguo, 64x menos que una lista de bools.
+            raw = {
+                "phash64_b64": base64.b64encode(ph_bytes).decode("ascii"),
+                "seq_sig_b64": base64.b64encode(seq_bytes).decode("ascii"),
+                "seq_shape": seq_shape,
+                "dtype": "bits",
+            }
 
-        return {
+        out = {
             "video_id": rec.get("video_id"),
             "url": rec.get("url"),
             "duration_s": rec.get("duration_s"),
-            "phash_bits": phash_len,
+            "phash_bits": 64,
             "seq_bits_shape": seq_shape,
-            "raw": {"phash64": ph_json, "seq_sig": seq_json},
+            "raw": raw,
         }
+        return NPORJSONResponse(content=out)
+
+    # Recientes (sin blobs): se sirve el JSON cacheado unos segundos si existe.
+    cache_key = (campaign_id, limit)
+    body = _RECENT_LISTING_CACHE.get(cache_key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
 
-        # Recientes (sin blobs)
     items = pg_recent_candidates(campaign_id, k=limit)
-    out = []
-    for it in items:
-        out.append({
-            "video_id": it["video_id"],
-            "url": it["url"],
-            "duration_s": it["duration_s"],
-            "phash_bits": it.get("phash_bits", 64),
-            "seq_bits_shape": [it.get("seq_rows", 0), it.get("seq_cols", 0)],
-            "created_at": it.get("created_at"),
-        })
-    return {"count": len(out), "items": out}
+    out = [_recent_item(it) for it in items]
+    body = orjson.dumps({"count": len(out), "items": out})
+    _RECENT_LISTING_CACHE.set(cache_key, body)
+    return Response(content=body, media_type="application/json")
 
 @router.post(
     "/_dev/cleanup-run",
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+import anyio
+from functools import partial
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from app.api.http.schemas.requests import EvaluateRequest
 from app.api.http.schemas.responses import EvaluateResponse
-from app.application.services.evaluate_service import EvaluateService
-from app.infrastructure.settings import get_settings, Settings
+from app.application.services.evaluate_service import EvaluateService, get_evaluate_service
 
 router = APIRouter(tags=["evaluate"])
 
+_evaluate_limiter: anyio.CapacityLimiter | None = None
+
+def _get_evaluate_limiter(total_tokens: int) -> anyio.CapacityLimiter:
+    """Limiter propio de /evaluate (se crea dentro del event loop, en la primera request)."""
+
+    global _evaluate_limiter
+    if _evaluate_limiter is None:
+        _evaluate_limiter = anyio.CapacityLimiter(max(1, total_tokens))
+    return _evaluate_limiter
+
 """
 Router público de evaluación de videos.
 
@@ -51,14 +62,18 @@ Notas:
         },
     },
 )
-def evaluate(req: EvaluateRequest, settings: Settings = Depends(get_settings)) -> EvaluateResponse:
+async def evaluate(
+    req: EvaluateRequest,
+    background: BackgroundTasks,
+    service: EvaluateService = Depends(get_evaluate_service),
+) -> EvaluateResponse:
     """
     Ejecuta la evaluación de un video contra una campaña.
 
     Entradas:
         - `campaign_id` (str): Identificador lógico de la campaña.
-        - `video_url` (HttpUrl): URL del video a evaluar.
-        - `candidates` (List[HttpUrl]): URLs explícitas a comparar como posibles duplicados.
+        - `video_url` (str http/https): URL del video a evaluar.
+        - `candidates` (List[str]): URLs explícitas a comparar como posibles duplicados.
         - `descripcion` (str): Brief/reglas de la campaña para juzgar alineación.
 
     Salidas:
@@ -70,11 +85,19 @@ def evaluate(req: EvaluateRequest, settings: Settings = Depends(get_settings)) -
             - `cost` (dict): Métricas de uso (llm_calls, embedding_calls, etc.).
 
     Errores:
-        - 500: Se propaga cualquier excepción no controlada (descarga, VLM, ASR, persistencia).
+        - 500: Se propaga cualquier excepción no controlada (descarga, VLM, ASR).
+
+    Las escrituras a Postgres (huellas del aprobado, end_date) corren como BackgroundTasks,
+    después de enviar la respuesta.
+
+    El pipeline (bloqueante: descarga, OpenCV, OpenAI) corre en hilos acotados por
+    `EVALUATE_CONCURRENCY`; las requests en espera no ocupan hilos del threadpool compartido.
     """
-    service = EvaluateService(settings=settings)
+    limiter = _get_evaluate_limiter(service.settings.EVALUATE_CONCURRENCY)
     try:
-        return service.evaluate(req)
+        return await anyio.to_thread.run_sync(
+            partial(service.evaluate, req, defer=background.add_task), limiter=limiter
+        )
     except Exception as e:
         # Propaga como 500 para que el cliente distinga error de una respuesta 200 válida
         raise HTTPException(status_code=500, detail=str(e))
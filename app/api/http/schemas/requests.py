@@ -1,7 +1,49 @@
-from pydantic import BaseModel, HttpUrl, Field, AliasChoices, ConfigDict
-from typing import List, Optional
+import re
+from pydantic import BaseModel, Field, AliasChoices, ConfigDict, AfterValidator, StringConstraints, model_validator
+from pydantic_core import Url
+from types import MappingProxyType
+from typing import Annotated, List, Optional
 from datetime import date
 
+# Mismo tope que `HttpUrl`.
+_URL_MAX_LEN = 2083
+_SCHEME_RE = re.compile(r"^https?://", re.IGNORECASE)
+# URLs que `HttpUrl` ya dejaría igual: esquema y host en minúsculas, host por nombre (último
+# label alfabético: no hay IPv4 que reescribir), sin puerto ni userinfo, path no vacío sin
+# segmentos `.`/`..` y sólo caracteres que no se percent-encodean.
+_CANONICAL_URL_RE = re.compile(
+    r"^https?://(?:[a-z0-9-]+\.)+[a-z][a-z0-9-]*(?![^?#]*/\.)/[A-Za-z0-9\-._~!$&()*+,;=:@/?]*$"
+)
+
+def _check_url(v: str) -> str:
+    """
+    Valida http(s) y devuelve la URL normalizada igual que `HttpUrl`: es la clave de
+    `pg_url_exists` / `pg_get_by_urls` / `video_id_for_url`, y debe coincidir con lo ya guardado.
+    Camino rápido por regex para las URLs que ya están en forma canónica (el caso común);
+    el resto (puerto por defecto, host IDN, espacios, mayúsculas...) pasa por `pydantic_core.Url`.
+    """
+
+    if len(v) > _URL_MAX_LEN or not _SCHEME_RE.match(v):
+        raise ValueError("URL inválida (se espera http(s)://...)")
+    if _CANONICAL_URL_RE.match(v):
+        return v
+    return str(Url(v))
+
+# URL como `str` ya normalizada: yt_dlp y Postgres trabajan con el string tal cual.
+FastUrl = Annotated[str, AfterValidator(_check_url)]
+
+# Límites validados en pydantic-core antes de llegar a PG / prompts.
+CampaignId = Annotated[str, StringConstraints(min_length=1, max_length=64, pattern=r"^[A-Za-z0-9_-]+$")]
+BriefText = Annotated[str, StringConstraints(min_length=1, max_length=8192)]
+
+# Sinónimos aceptados en el body de /evaluate -> nombre canónico del campo.
+_EVALUATE_ALIASES = MappingProxyType({
+    "end_date": ("endDate",),
+    "video_url": ("url",),
+    "candidates": ("urls", "List<urls>"),
+    "descripcion": ("DescripcionCampaña", "DescripcionCampana", "descripcionCampaña"),
+})
+
 class EvaluateRequest(BaseModel):
     """
     Payload de evaluación de un video dentro de una campaña.
@@ -26,32 +68,37 @@ class EvaluateRequest(BaseModel):
         }
     )
 
-    campaign_id: str = Field(..., description="ID de campaña")
+    campaign_id: CampaignId = Field(..., description="ID de campaña ([A-Za-z0-9_-], máx. 64)")
 
-    end_date: date = Field(
-        ...,
-        alias="endDate",
-        description="Fecha fin de la campaña (YYYY-MM-DD).",
-        validation_alias=AliasChoices("end_date", "endDate"),
-    )
+    end_date: date = Field(..., description="Fecha fin de la campaña (YYYY-MM-DD). Alias: `endDate`.")
 
-    video_url: HttpUrl = Field(
-        ...,
-        description="URL del video base",
-        validation_alias=AliasChoices("video_url", "url"),
-    )
+    video_url: FastUrl = Field(..., description="URL del video base. Alias: `url`.")
 
-    candidates: List[HttpUrl] = Field(
+    candidates: List[FastUrl] = Field(
         default_factory=list,
-        description="Posibles duplicados explícitos (opcional)",
-        validation_alias=AliasChoices("candidates", "urls", "List<urls>"),
+        description="Posibles duplicados explícitos (opcional). Alias: `urls`.",
     )
 
-    descripcion: str = Field(
-        ...,
-        description="Brief de campaña con requisitos a validar",
-        validation_alias=AliasChoices("descripcion", "DescripcionCampaña", "DescripcionCampana", "descripcionCampaña"),
-    )
+    descripcion: BriefText = Field(..., description="Brief de campaña con requisitos a validar (máx. 8192 caracteres)")
+
+    @model_validator(mode="before")
+    @classmethod
+    def _apply_aliases(cls, data):
+        """Renombra sinónimos a sus campos canónicos en una sola pasada sobre el dict de entrada."""
+
+        if not isinstance(data, dict):
+            return data
+        renamed = None
+        for canonical, alts in _EVALUATE_ALIASES.items():
+            if canonical in data:
+                continue
+            for alt in alts:
+                if alt in data:
+                    if renamed is None:
+                        renamed = dict(data)
+                    renamed[canonical] = renamed.pop(alt)
+                    break
+        return data if renamed is None else renamed
 
 class GenerateScriptRequest(BaseModel):
     """
@@ -1,5 +1,21 @@
-from pydantic import BaseModel
-from typing import Optional, Literal
+from enum import IntEnum
+from pydantic import BaseModel, BeforeValidator, PlainSerializer
+from typing import Annotated, Optional, Literal
+
+class DupReason(IntEnum):
+    """Motivo de duplicado. En el JSON viaja su nombre ("URL", "HASH", ...), como siempre."""
+    URL = 1
+    HASH = 2
+    SEQ = 3
+    AUDIO = 4
+    SEMANTIC = 5
+
+# Acepta el miembro o su nombre (FastAPI re-valida el dump del response_model) y serializa el nombre.
+DupReasonName = Annotated[
+    DupReason,
+    BeforeValidator(lambda v: DupReason[v] if isinstance(v, str) else v),
+    PlainSerializer(lambda r: r.name, return_type=Literal["HASH", "SEQ", "AUDIO", "SEMANTIC", "URL"]),
+]
 
 class AlignmentResult(BaseModel):
     """
@@ -23,7 +39,7 @@ class EvaluateResponse(BaseModel):
     - cost: métricas de uso (llm_calls, embedding_calls, etc.)
     """
     duplicated: bool
-    duplicate_reason: Optional[Literal["HASH", "SEQ", "AUDIO", "SEMANTIC", "URL"]] = None
+    duplicate_reason: Optional[DupReasonName] = None
     duplicate_candidate_url: Optional[str] = None
     alignment: Optional[AlignmentResult] = None
     cost: dict
@@ -1,13 +1,23 @@
-import os, json, tempfile, shutil, hashlib
+import os, tempfile, shutil
 import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
 
 from app.api.http.schemas.requests import EvaluateRequest
-from app.api.http.schemas.responses import EvaluateResponse, AlignmentResult
-from app.infrastructure.settings import Settings
+from app.api.http.schemas.responses import EvaluateResponse, AlignmentResult, DupReason
+from app.infrastructure.settings import Settings, get_settings
 from app.infrastructure.downloading.downloader import descargar_video
-from app.infrastructure.cv.phash import video_fingerprint, similarity_percent
-from app.infrastructure.cv.sequence import frame_hash_sequence, sequence_match_percent, get_duration_s
+from app.infrastructure.cv.phash import (
+    video_fingerprint, similarity_percent_many, phash_similarity_u64,
+    fingerprint_and_sequence,
+)
+from app.infrastructure.cv.sequence import (
+    frame_hash_sequence, sequence_match_percent_packed, sequence_match_percent_many, get_duration_s,
+    expected_sequence_len, max_match_percent,
+)
 from app.infrastructure.nlp.vlm_summary import (
     analyze_frames_free_narrative,
     summarize_video_textual,
@@ -15,12 +25,30 @@ from app.infrastructure.nlp.vlm_summary import (
 )
 from app.infrastructure.nlp.align_judge import comparar_descripcion_con_resumen_ia
 from app.infrastructure.pg.dao import (
-    pg_get_by_url, pg_save_video_features, pg_recent_candidates,
-    pg_upsert_campaign_end_date
+    pg_get_by_urls, pg_url_exists, pg_get_by_content_key, enqueue_save_video_features, pg_recent_fingerprints,
+    pg_upsert_campaign_end_date, video_id_for_url,
+)
+from app.infrastructure.audio.ffmpeg import extract_mp3_segments
+from app.infrastructure.audio.transcribe import transcribe_segments
+from app.infrastructure.content_cache import (
+    content_key, text_key, memoized,
+    FINGERPRINT_CACHE, SEQUENCE_CACHE, DURATION_CACHE, SUMMARY_CACHE, ALIGNMENT_CACHE,
 )
-from app.infrastructure.audio.ffmpeg import extract_wav_mono16k
-from app.infrastructure.audio.transcribe import transcribe_audio
 
+# Costo de una respuesta sin llamadas a modelos (duplicados y atajos); se copia por respuesta.
+_ZERO_COST = MappingProxyType({"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False})
+
+@dataclass(frozen=True)
+class BaseProbe:
+    """
+    Lo que el dedupe y la persistencia necesitan del MP4 base, calculado UNA vez por request:
+    clave de contenido, pHash64 como int, secuencia empaquetada (uint64[M]) y duración.
+    """
+
+    key: str
+    fp_u64: int | None
+    seq_u64: np.ndarray
+    duration_s: float
 
 @dataclass
 class EvaluateService:
@@ -34,7 +62,7 @@ class EvaluateService:
          - Secuencia de dHash por frame (bool[M,64]) con tolerancia temporal (SEQ gate).
       3) Si NO es duplicado:
          - Extrae keyframes del MP4 (en memoria, EFÍMEROS) y audio opcional (ASR).
-         - VLM con frames base64 + transcript opcional.
+         - VLM con keyframes JPEG (base64 sólo al armar el mensaje) + transcript opcional.
          - Juez de alineación contra `descripcion`.
       4) Persistencia SOLO si aprueba:
          - Guarda huellas en Postgres (source of truth).
@@ -42,48 +70,223 @@ class EvaluateService:
 
     Garantías:
       - El MP4 del base se descarga como máximo una vez por request (si faltan insumos).
-      - Keyframes/audio son EFÍMEROS y se eliminan al final de la request.
+      - Keyframes/audio son EFÍMEROS (en memoria) y se descartan al final de la request.
     """
 
     settings: Settings
 
-    def _mktemp(self):
+    def _mktemp(self) -> tempfile.TemporaryDirectory:
+        """
+        Directorio temporal aislado por request (sólo MP4 del base y de los candidates),
+        como `TemporaryDirectory`: `evaluate` lo limpia con `cleanup()` al terminar.
+
+        Se crea en tmpfs (`REQ_TMPFS_DIR`, p.ej. /dev/shm) si existe y tiene espacio libre
+        para el peor caso de la request (base + candidates en paralelo, a `VIDEO_MAX_MB` cada uno);
+        si no, en el $TMPDIR por defecto. Keyframes y audio para ASR ya no tocan disco.
+        """
+        tmpfs = self.settings.REQ_TMPFS_DIR
+        needed = (1 + self.settings.CANDIDATES_CONCURRENCY) * self.settings.VIDEO_MAX_MB * 1024 * 1024
+        base_dir = None
+        if tmpfs and os.path.isdir(tmpfs):
+            try:
+                if shutil.disk_usage(tmpfs).free >= needed:
+                    base_dir = tmpfs
+            except OSError:
+                pass
+        return tempfile.TemporaryDirectory(prefix="req_", dir=base_dir, ignore_cleanup_errors=True)
+
+    def _transcribe(self, video_path: str, duration_s: float | None = None):
+        """
+        Extrae el audio a MP3 mono `AUDIO_TARGET_SR` en memoria (en tramos de `ASR_SEGMENT_S`)
+        y transcribe los tramos en paralelo. None si falla o no hay audio.
+        """
+        segments = extract_mp3_segments(
+            video_path, segment_s=self.settings.ASR_SEGMENT_S, sr=self.settings.AUDIO_TARGET_SR,
+            duration_s=duration_s,
+        )
+        return transcribe_segments(segments)
+
+    def _seed_features_from_pg(self, key: str) -> None:
+        """
+        Si el cache en proceso no tiene las huellas de este contenido (reinicio, otro worker),
+        las toma de PG por `content_key` antes de decodificar el MP4 (mismo archivo, otra URL).
+        """
+        if FINGERPRINT_CACHE.get(key) is not None and SEQUENCE_CACHE.get(key) is not None:
+            return
+        try:
+            rec = pg_get_by_content_key(key)
+        except Exception:
+            # Sin la columna (migración 003 pendiente) o PG caído: se recalcula como antes.
+            return
+        if rec:
+            FINGERPRINT_CACHE.set(key, rec["phash64_u64"])
+            SEQUENCE_CACHE.set(key, rec["seq_u64"])
+            if rec["duration_s"] > 0:
+                DURATION_CACHE.set(key, rec["duration_s"])
+
+    def _base_fingerprints(self, key: str, path: str):
         """
-        Directorio temporal aislado por request.
+        (pHash64 int, secuencia uint64[M]) del MP4 base: cache en proceso, luego PG por contenido
+        y, si no, una sola decodificación fusionada para ambas huellas.
+        """
+        self._seed_features_from_pg(key)
+        fp = FINGERPRINT_CACHE.get(key)
+        seq = SEQUENCE_CACHE.get(key)
+        if fp is None or seq is None:
+            fp, seq = fingerprint_and_sequence(
+                path, fp_interval=5.0, fp_max_frames=20, seq_interval=2.0, seq_max_frames=60, hash_size=8,
+            )
+            if fp is not None:
+                FINGERPRINT_CACHE.set(key, fp)
+            SEQUENCE_CACHE.set(key, seq)
+        return fp, seq
+
+    def _base_duration(self, key: str, path: str) -> float:
+        """Duración del MP4 base: cache por contenido (o la guardada en PG) y, si no, ffprobe una vez."""
+        return memoized(DURATION_CACHE, key, get_duration_s, path)
+
+    def _check_downloaded_candidate(self, cand_url: str, root: str, base: BaseProbe):
+        """
+        Descarga un candidate sin features y lo compara contra el base (HASH y luego SEQ).
+        Cada candidate usa su propio subdirectorio de `root`, que se borra apenas se decide
+        (no se acumulan MP4 en disco durante listas largas de candidates).
 
-        Estructura:
-          <tmp>/frames/ -> (no persistimos aquí frames; sólo si hiciera falta)
-          <tmp>/audio/  -> WAV temporal para ASR
+        Returns:
+            (DupReason.HASH|SEQ, url) si es duplicado; None si no lo es o no se pudo descargar.
         """
-        root = tempfile.mkdtemp(prefix="req_")
-        frames = os.path.join(root, "frames")
-        audio = os.path.join(root, "audio")
-        os.makedirs(frames, exist_ok=True)
-        os.makedirs(audio, exist_ok=True)
-        return root, frames, audio
-
-    def evaluate(self, req: EvaluateRequest) -> EvaluateResponse:
+        with tempfile.TemporaryDirectory(prefix="cand_", dir=root, ignore_cleanup_errors=True) as cand_dir:
+            cand_path = descargar_video(
+                cand_url, output_folder=cand_dir,
+                size_mb_limit=self.settings.VIDEO_MAX_MB, timeout_s=self.settings.DL_TIMEOUT_S,
+            )
+            if not cand_path:
+                return None
+            return self._compare_candidate_file(cand_url, cand_path, base)
+
+    def _compare_candidate_file(self, cand_url: str, cand_path: str, base: BaseProbe):
+        """
+        Compara un MP4 de candidate ya descargado contra el base (HASH y luego SEQ).
+        Base y candidate ya vienen empaquetados (int / uint64[M]): XOR + popcount directos.
+        Las huellas del candidate se reutilizan por contenido (cache en proceso o PG) antes de decodificar.
+        """
+        cand_key = content_key(cand_path)
+        self._seed_features_from_pg(cand_key)
+        cand_fp = memoized(
+            FINGERPRINT_CACHE, cand_key,
+            video_fingerprint, cand_path, seconds_interval=5.0, max_frames=20,
+        )
+        if phash_similarity_u64(base.fp_u64, cand_fp) >= self.settings.HASH_DUP_THRESHOLD:
+            return DupReason.HASH, cand_url
+        # Descarte barato antes de decodificar 60 frames: si el candidate es tan corto que
+        # ni un match perfecto alcanza el umbral SEQ, no vale la pena calcular su secuencia.
+        # (+1 frame de margen por diferencias entre duración de contenedor y de stream.)
+        cand_len = expected_sequence_len(memoized(DURATION_CACHE, cand_key, get_duration_s, cand_path)) + 1
+        if max_match_percent(len(base.seq_u64), cand_len, window=2) < self.settings.SEQ_DUP_THRESHOLD:
+            return None
+        cand_seq = memoized(
+            SEQUENCE_CACHE, cand_key,
+            frame_hash_sequence, cand_path, seconds_interval=2.0, max_frames=60, hash_size=8,
+        )
+        if sequence_match_percent_packed(
+            base.seq_u64, cand_seq, bit_tolerance=5, window=2
+        ) >= self.settings.SEQ_DUP_THRESHOLD:
+            return DupReason.SEQ, cand_url
+        return None
+
+    def _first_downloaded_duplicate(self, cand_urls: list[str], root: str, base: BaseProbe):
+        """
+        Procesa los candidates sin features en paralelo (descarga + huellas), acotado por
+        `CANDIDATES_CONCURRENCY`. Devuelve el primer duplicado que termine; los pendientes
+        se cancelan y se espera a los que ya están corriendo antes de limpiar `root`.
+        """
+        workers = max(1, min(self.settings.CANDIDATES_CONCURRENCY, len(cand_urls)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cand") as pool:
+            futures = [
+                pool.submit(self._check_downloaded_candidate, u, root, base)
+                for u in cand_urls
+            ]
+            try:
+                for fut in as_completed(futures):
+                    hit = fut.result()
+                    if hit:
+                        return hit
+            finally:
+                for fut in futures:
+                    fut.cancel()
+        return None
+
+    def _first_stored_duplicate(self, base: BaseProbe, entries: list[dict], hash_thr: float, seq_thr: float):
+        """
+        Dedupe contra features ya guardadas (`phash64_u64`, `seq_u64`) en dos pasadas vectorizadas:
+        HASH gate contra todas (XOR + popcount sobre uint64[K]) y, sin hit, SEQ gate con las K
+        secuencias apiladas. Devuelve (DupReason, url) del primer duplicado o None.
+        """
+        if not entries:
+            return None
+        if base.fp_u64 is not None:
+            fps = np.fromiter((e["phash64_u64"] for e in entries), dtype=np.uint64, count=len(entries))
+            hash_hits = np.flatnonzero(similarity_percent_many(base.fp_u64, fps) >= hash_thr)
+            if hash_hits.size:
+                return DupReason.HASH, entries[hash_hits[0]]["url"]
+        seq_hits = np.flatnonzero(
+            sequence_match_percent_many(
+                base.seq_u64, [e["seq_u64"] for e in entries], bit_tolerance=5, window=2
+            ) >= seq_thr
+        )
+        if seq_hits.size:
+            return DupReason.SEQ, entries[seq_hits[0]]["url"]
+        return None
+
+    def _upsert_end_date(self, campaign_id: str, end_date) -> None:
+        """Actualiza la retención de la campaña; un fallo aquí no aborta la evaluación."""
+        try:
+            pg_upsert_campaign_end_date(campaign_id, end_date)
+        except Exception as _e:
+            # No abortamos la evaluación por esto; solo log si quieres.
+            pass
+
+    def evaluate(self, req: EvaluateRequest, defer=None) -> EvaluateResponse:
         """
         Orquesta el flujo completo de dedupe + alineación.
         No modifica estado si el video resulta duplicado.
+
+        `defer(fn, *args, **kwargs)` (p.ej. `BackgroundTasks.add_task`) recibe las escrituras
+        a PG para correrlas después de enviar la respuesta; sin `defer` se ejecutan en línea.
+        Las huellas aprobadas no pasan por `defer`: se encolan para el INSERT en lote de dao.
         """
+        run_write = defer or (lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        # Umbrales leídos una vez: se comparan dentro del bucle de candidates.
+        hash_thr = self.settings.HASH_DUP_THRESHOLD
+        seq_thr = self.settings.SEQ_DUP_THRESHOLD
 
-        root, frames_dir, audio_dir = self._mktemp()
+        # --- 1) Lookup por URL en PG (short-circuit duplicado): un SELECT 1 por índice,
+        # antes de crear tmpdir/pool y sin decodificar huellas.
+        # Un candidate con la misma URL tampoco necesita huellas: se resuelve antes de descargar.
+        if req.video_url in req.candidates or pg_url_exists(req.video_url):
+            return EvaluateResponse(
+                duplicated=True,
+                duplicate_reason=DupReason.URL,
+                duplicate_candidate_url=req.video_url,
+                alignment=None,
+                cost=dict(_ZERO_COST),
+            )
+        # Candidates únicos en el orden recibido (el propio video ya se descartó arriba):
+        # una URL repetida no genera otra consulta ni otra descarga.
+        candidates = list(dict.fromkeys(req.candidates))
+
+        tmp = self._mktemp()
+        root = tmp.name
+        # Pool por request para los trabajos independientes sobre el MP4 base.
+        base_pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="base")
         try:
-            # --- 1) Lookup por URL en PG (short-circuit duplicado)
-            cached = pg_get_by_url(str(req.video_url))
-            if cached:
-                return EvaluateResponse(
-                    duplicated=True,
-                    duplicate_reason="URL",
-                    duplicate_candidate_url=str(req.video_url),
-                    alignment=None,
-                    cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                )
+            # Recientes de la campaña y features de los candidates explícitos: consultas
+            # independientes de la descarga del base, se solapan con ella.
+            recent_fut = base_pool.submit(pg_recent_fingerprints, req.campaign_id, k=50)
+            cands_fut = base_pool.submit(pg_get_by_urls, candidates) if candidates else None
 
             # --- 2) Descarga base UNA sola vez y calcula huellas/insumos
             base_path = descargar_video(
-                str(req.video_url),
+                req.video_url,
                 output_folder=root,
                 size_mb_limit=self.settings.VIDEO_MAX_MB,
                 timeout_s=self.settings.DL_TIMEOUT_S,
@@ -91,152 +294,138 @@ class EvaluateService:
             if not base_path:
                 raise RuntimeError("No se pudo descargar el video base.")
 
-            # Huellas para dedupe
-            base_fp = video_fingerprint(base_path, seconds_interval=5.0, max_frames=20)
-            base_seq = frame_hash_sequence(base_path, seconds_interval=2.0, max_frames=60, hash_size=8)
+            # Huellas para dedupe (una decodificación para pHash + secuencia), memoizadas por
+            # contenido: el mismo MP4 bajo otra URL no se recalcula.
+            base_key = content_key(base_path)
+            feats_fut = base_pool.submit(self._base_fingerprints, base_key, base_path)
+            summary_key = (base_key, self.settings.VLM_IMAGE_DETAIL)
+            # Mismo contenido + mismo brief -> mismo veredicto: se salta VLM y juez.
+            align_key = summary_key + (text_key(req.descripcion),)
+            cached_alignment = ALIGNMENT_CACHE.get(align_key)
+            cached_summary = SUMMARY_CACHE.get(summary_key)
+            needs_vlm = cached_alignment is None and cached_summary is None
 
-            # Keyframes EFÍMEROS + ASR opcional para VLM
-            frames_b64 = _uniform_keyframes(base_path, max_frames=self.settings.FRAMES_MAX)
-            transcript_text = None
-            if getattr(self.settings, "AUDIO_ASR_ENABLED", True):
-                wav_path = os.path.join(audio_dir, "audio.wav")
-                if extract_wav_mono16k(base_path, wav_path, sr=self.settings.AUDIO_TARGET_SR):
-                    transcript_text = transcribe_audio(wav_path)
+            # Duración una sola vez por contenido: la usan el ASR, el filtro de candidates y la persistencia.
+            base_dur = self._base_duration(base_key, base_path)
+
+            base_fp_u64, base_seq_u64 = feats_fut.result()
+            # Huellas ya empaquetadas (pHash64 como int, secuencia como uint64[M]):
+            # dedupe y persistencia leen de aquí, nada se recalcula después.
+            base = BaseProbe(key=base_key, fp_u64=base_fp_u64, seq_u64=base_seq_u64, duration_s=base_dur)
 
             # --- 3) Dedup contra recientes (PG)
-            if base_fp is not None and base_seq is not None:
-                for cand in pg_recent_candidates(req.campaign_id, k=50):
-                    cand_fp = np.array(cand["phash64"], dtype=np.uint8)
-                    if similarity_percent(base_fp, cand_fp) >= self.settings.HASH_DUP_THRESHOLD:
-                        return EvaluateResponse(
-                            duplicated=True,
-                            duplicate_reason="HASH",
-                            duplicate_candidate_url=cand["url"],
-                            alignment=None,
-                            cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                        )
-                    cand_seq = np.array(cand["seq_sig"], dtype=bool)
-                    if sequence_match_percent(base_seq, cand_seq, bit_tolerance=5, window=2) >= self.settings.SEQ_DUP_THRESHOLD:
-                        return EvaluateResponse(
-                            duplicated=True,
-                            duplicate_reason="SEQ",
-                            duplicate_candidate_url=cand["url"],
-                            alignment=None,
-                            cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                        )
+            recents = recent_fut.result() if base.fp_u64 is not None else []
+            hit = self._first_stored_duplicate(base, recents, hash_thr, seq_thr)
 
             # --- 4) Dedup contra candidates explícitos (PG)
-            for cand_url in req.candidates:
-                # Igual URL -> duplicado directo
-                if str(cand_url) == str(req.video_url):
+            # Features de todos los candidates (una sola consulta, lanzada antes de la descarga);
+            # los que ya tienen features se comparan en bloque como los recientes.
+            if not hit:
+                cached_cands = cands_fut.result() if cands_fut else {}
+                stored = [cached_cands[u] for u in candidates if u in cached_cands]
+                hit = self._first_stored_duplicate(base, stored, hash_thr, seq_thr)
+            if hit:
+                reason, dup_url = hit
+                return EvaluateResponse(
+                    duplicated=True,
+                    duplicate_reason=reason,
+                    duplicate_candidate_url=dup_url,
+                    alignment=None,
+                    cost=dict(_ZERO_COST),
+                )
+
+            # Candidates sin features -> se descargan y comparan en paralelo
+            to_download = [u for u in candidates if u not in cached_cands]
+            if to_download:
+                hit = self._first_downloaded_duplicate(to_download, root, base)
+                if hit:
+                    reason, dup_url = hit
                     return EvaluateResponse(
                         duplicated=True,
-                        duplicate_reason="URL",
-                        duplicate_candidate_url=str(cand_url),
+                        duplicate_reason=reason,
+                        duplicate_candidate_url=dup_url,
                         alignment=None,
-                        cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
+                        cost=dict(_ZERO_COST),
                     )
 
-                cached_cand = pg_get_by_url(str(cand_url))
-                if cached_cand:
-                    cand_fp = np.array(cached_cand["phash64"], dtype=np.uint8)
-                    if similarity_percent(base_fp, cand_fp) >= self.settings.HASH_DUP_THRESHOLD:
-                        return EvaluateResponse(
-                            duplicated=True,
-                            duplicate_reason="HASH",
-                            duplicate_candidate_url=cached_cand["url"],
-                            alignment=None,
-                            cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                        )
-                    cand_seq = np.array(cached_cand["seq_sig"], dtype=bool)
-                    if sequence_match_percent(base_seq, cand_seq, bit_tolerance=5, window=2) >= self.settings.SEQ_DUP_THRESHOLD:
-                        return EvaluateResponse(
-                            duplicated=True,
-                            duplicate_reason="SEQ",
-                            duplicate_candidate_url=cached_cand["url"],
-                            alignment=None,
-                            cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                        )
-                    continue
-
-                # Candidate sin features -> descargar candidate y comparar (barato)
-                cand_path = descargar_video(
-                    str(cand_url), output_folder=root,
-                    size_mb_limit=self.settings.VIDEO_MAX_MB, timeout_s=self.settings.DL_TIMEOUT_S
-                )
-                if not cand_path:
-                    continue
-                cand_fp = video_fingerprint(cand_path, seconds_interval=5.0, max_frames=20)
-                if similarity_percent(base_fp, cand_fp) >= self.settings.HASH_DUP_THRESHOLD:
-                    return EvaluateResponse(
-                        duplicated=True,
-                        duplicate_reason="HASH",
-                        duplicate_candidate_url=str(cand_url),
-                        alignment=None,
-                        cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
+            # --- 5) VLM + juez de alineación
+            # Keyframes EFÍMEROS y ASR opcional recién ahora, con el dedupe superado: un duplicado
+            # no paga Whisper ni deja trabajos leyendo el MP4 después de responder.
+            # Entre ellos sí corren en paralelo (OpenCV y ffmpeg liberan el GIL).
+            frames_fut = asr_fut = None
+            if needs_vlm:
+                frames_fut = base_pool.submit(_uniform_keyframes, base_path, max_frames=self.settings.FRAMES_MAX)
+                if getattr(self.settings, "AUDIO_ASR_ENABLED", True):
+                    asr_fut = base_pool.submit(self._transcribe, base_path, base_dur)
+
+            if cached_alignment is not None:
+                cmp_json = cached_alignment
+                llm_calls = 0
+            else:
+                summary = cached_summary
+                llm_calls = 0
+                if summary is None:
+                    keyframes = frames_fut.result()
+                    transcript_text = asr_fut.result() if asr_fut else None
+                    summary = analyze_frames_free_narrative(
+                        keyframes, transcript_text=transcript_text, image_detail=self.settings.VLM_IMAGE_DETAIL
                     )
-                cand_seq = frame_hash_sequence(cand_path, seconds_interval=2.0, max_frames=60, hash_size=8)
-                if sequence_match_percent(base_seq, cand_seq, bit_tolerance=5, window=2) >= self.settings.SEQ_DUP_THRESHOLD:
+                    llm_calls = 1 if summary else 0
+                    if summary:
+                        SUMMARY_CACHE.set(summary_key, summary)
+                if not summary:
                     return EvaluateResponse(
-                        duplicated=True,
-                        duplicate_reason="SEQ",
-                        duplicate_candidate_url=str(cand_url),
-                        alignment=None,
-                        cost={"llm_calls": 0, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
+                        duplicated=False,
+                        duplicate_reason=None,
+                        duplicate_candidate_url=None,
+                        alignment=AlignmentResult(
+                            aproved=False, match_percent=0.0,
+                            reasons="No se pudo generar el resumen del video."
+                        ),
+                        cost={**_ZERO_COST, "llm_calls": llm_calls},
                     )
 
-            # --- 5) VLM + juez de alineación
-            summary = analyze_frames_free_narrative(frames_b64, transcript_text=transcript_text)
-            llm_calls = 1 if summary else 0
-            if not summary:
-                return EvaluateResponse(
-                    duplicated=False,
-                    duplicate_reason=None,
-                    duplicate_candidate_url=None,
-                    alignment=AlignmentResult(
-                        aproved=False, match_percent=0.0,
-                        reasons="No se pudo generar el resumen del video."
-                    ),
-                    cost={"llm_calls": llm_calls, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                )
-
-            _compact_text = summarize_video_textual(summary)
+                _compact_text = summarize_video_textual(summary)
 
-            cmp_raw = comparar_descripcion_con_resumen_ia(req.descripcion, summary, umbral_aprobacion=70)
-            if not cmp_raw:
-                return EvaluateResponse(
-                    duplicated=False,
-                    duplicate_reason=None,
-                    duplicate_candidate_url=None,
-                    alignment=AlignmentResult(
-                        aproved=False, match_percent=0.0,
-                        reasons="No se pudo comparar la descripción con el resumen."
-                    ),
-                    cost={"llm_calls": llm_calls, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
-                )
-            try:
-                cmp_json = json.loads(cmp_raw)
-            except Exception:
-                cmp_json = {"aproved": False, "match_percent": 0.0, "reasons": "Respuesta IA inválida."}
+                cmp_raw = comparar_descripcion_con_resumen_ia(req.descripcion, summary, umbral_aprobacion=70)
+                if not cmp_raw:
+                    return EvaluateResponse(
+                        duplicated=False,
+                        duplicate_reason=None,
+                        duplicate_candidate_url=None,
+                        alignment=AlignmentResult(
+                            aproved=False, match_percent=0.0,
+                            reasons="No se pudo comparar la descripción con el resumen."
+                        ),
+                        cost={**_ZERO_COST, "llm_calls": llm_calls},
+                    )
+                try:
+                    cmp_json = orjson.loads(cmp_raw)
+                except orjson.JSONDecodeError:
+                    cmp_json = None
+                # JSON válido pero no objeto (lista, número...) también es una respuesta inválida.
+                if isinstance(cmp_json, dict):
+                    ALIGNMENT_CACHE.set(align_key, cmp_json)
+                else:
+                    cmp_json = {"aproved": False, "match_percent": 0.0, "reasons": "Respuesta IA inválida."}
 
             if getattr(req, "end_date", None):
-                try:
-                    pg_upsert_campaign_end_date(req.campaign_id, req.end_date)
-                except Exception as _e:
-                    # No abortamos la evaluación por esto; solo log si quieres.
-                    pass
+                run_write(self._upsert_end_date, req.campaign_id, req.end_date)
 
             # --- 6) Persistencia SOLO si aprueba (no guardamos rechazados)
             is_approved = bool(cmp_json.get("aproved", False))
-            if is_approved:
-                video_id = hashlib.sha1(str(req.video_url).encode()).hexdigest()
-                pg_save_video_features(
+            # Sin pHash (MP4 sin frames legibles) no hay huella contra la cual deduplicar.
+            if is_approved and base.fp_u64 is not None:
+                video_id = video_id_for_url(req.video_url)
+                # Encolado: el flusher de dao lo inserta en lote junto con otras aprobaciones.
+                enqueue_save_video_features(
                     video_id=video_id,
                     campaign_id=req.campaign_id,
-                    url=str(req.video_url),
-                    phash64_bits=base_fp,
-                    seq_bits=base_seq,
-                    duration_s=get_duration_s(base_path) if base_path else 0.0,
+                    url=req.video_url,
+                    phash64_u64=base.fp_u64,
+                    seq_u64=base.seq_u64,
+                    duration_s=base.duration_s,
+                    content_key=base.key,
                 )
 
             # --- 7) Respuesta final
@@ -249,8 +438,20 @@ class EvaluateService:
                     match_percent=float(cmp_json.get("match_percent", 0.0)),
                     reasons=str(cmp_json.get("reasons", "Sin motivos.")),
                 ),
-                cost={"llm_calls": llm_calls, "embedding_calls": 0, "transcription_seconds": 0, "degraded_path": False},
+                cost={**_ZERO_COST, "llm_calls": llm_calls},
             )
 
         finally:
-            shutil.rmtree(root, ignore_errors=True)
+            # Se cancela lo que no arrancó y se espera lo que ya corre (consultas PG o, ante un error,
+            # keyframes/ASR) antes de borrar el tmpdir que esos trabajos todavía podrían estar leyendo.
+            base_pool.shutdown(wait=True, cancel_futures=True)
+            tmp.cleanup()
+
+@lru_cache
+def get_evaluate_service() -> EvaluateService:
+    """
+    Singleton del servicio para inyectar en FastAPI. El servicio no guarda estado por request
+    (tmpdir/pools viven dentro de `evaluate`), así que se comparte entre requests.
+    """
+
+    return EvaluateService(settings=get_settings())
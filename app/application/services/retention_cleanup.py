@@ -8,7 +8,7 @@ from app.infrastructure.pg.dao import (
     pg_delete_videos_by_campaign,
     pg_delete_campaign_retention,
 )
-from app.infrastructure.keyframes.cache_fs import _dir_for as _kf_dir
+from app.infrastructure.keyframes.cache_fs import existing_video_dirs
 
 @dataclass
 class RetentionCleaner:
@@ -27,27 +27,35 @@ class RetentionCleaner:
             await asyncio.sleep(interval)
 
     async def _run_once(self):
+        """
+        Limpia las campañas vencidas en paralelo (hasta `CLEANUP_CONCURRENCY` a la vez).
+        PG y el FS son bloqueantes: corren en hilos para no frenar el event loop.
+        """
         today = date.today()
-        expired = pg_expired_campaign_ids(today)
+        expired = await asyncio.to_thread(pg_expired_campaign_ids, today)
         if not expired:
             return
 
-        base_dir = self.settings.KEYFRAMES_DIR
-        for cid in expired:
+        sem = asyncio.Semaphore(max(1, int(self.settings.CLEANUP_CONCURRENCY)))
+        await asyncio.gather(*(self._clean_campaign(cid, sem) for cid in expired))
+
+    async def _clean_campaign(self, cid: str, sem: asyncio.Semaphore):
+        """Borra los videos de `cid` en PG, sus keyframes en FS y la fila de retención."""
+        async with sem:
             # 1) borra de Postgres y obtén video_ids
-            video_ids = pg_delete_videos_by_campaign(cid)
+            try:
+                video_ids = await asyncio.to_thread(pg_delete_videos_by_campaign, cid)
+            except Exception:
+                return
 
-            # 2) limpia keyframes en FS
-            for vid in video_ids:
-                try:
-                    d = _kf_dir(vid, base_dir)
-                    shutil.rmtree(d, ignore_errors=True)
-                except Exception:
-                    pass
+            # 2) limpia keyframes en FS: sólo los directorios que existen (un listado del cache,
+            # sin crear/borrar directorios vacíos), un rmtree por video en paralelo
+            dirs = await asyncio.to_thread(existing_video_dirs, video_ids, self.settings.KEYFRAMES_DIR)
+            await asyncio.gather(*(asyncio.to_thread(shutil.rmtree, d, True) for d in dirs))
 
             # 3) borra la fila de retención
             try:
-                pg_delete_campaign_retention(cid)
+                await asyncio.to_thread(pg_delete_campaign_retention, cid)
             except Exception:
                 pass
 
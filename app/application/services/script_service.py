@@ -5,9 +5,10 @@ from typing import Optional
 from openai import OpenAI
 
 from app.infrastructure.nlp.script_templates import build_campaign_script_prompt
+from app.infrastructure.nlp.openai_client import get_openai_client
 
-FENCE_START = re.compile(r"^```(?:\w+)?\s*", re.IGNORECASE)
-FENCE_END   = re.compile(r"\s*```$")
+# Fence opcional al inicio (con lenguaje) y al final; el grupo 1 es el contenido ya sin espacios en los bordes.
+FENCED = re.compile(r"^\s*(?:```\w*)?\s*(.*?)\s*(?:```)?\s*$", re.DOTALL)
 
 @dataclass
 class ScriptGeneratorService:
@@ -22,7 +23,7 @@ class ScriptGeneratorService:
 
     def _client(self) -> OpenAI:
         """
-        Crea el cliente de OpenAI usando la API Key del entorno.
+        Devuelve el cliente OpenAI compartido (pool de conexiones reutilizado entre requests).
 
         Raises:
          RuntimeError: si OPENAI_API_KEY no está configurada.
@@ -30,7 +31,7 @@ class ScriptGeneratorService:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY no configurado")
-        return OpenAI(api_key=api_key)
+        return get_openai_client()
 
     def _strip_code_fences(self, content: str) -> str:
         """
@@ -39,9 +40,7 @@ class ScriptGeneratorService:
         """
         if not content:
             return content
-        content = FENCE_START.sub("", content).strip()
-        content = FENCE_END.sub("", content).strip()
-        return content
+        return FENCED.match(content).group(1)
 
     def generate_script(self, description: str, category: str, creator_type: str, requirements: Optional[str]) -> str:
         """
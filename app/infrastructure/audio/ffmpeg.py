@@ -1,8 +1,13 @@
-import subprocess, os
+import subprocess, os, math
+from concurrent.futures import ThreadPoolExecutor
+
+from app.infrastructure.cv.sequence import get_duration_s
 
 """
 Extracción de audio:
 - Convierte el track de un .mp4 a WAV mono 16 kHz (por defecto), ideal para ASR.
+- O lo entrega directo en memoria como MP3 mono de bajo bitrate (sin archivos temporales),
+  opcionalmente en tramos para videos largos.
 """
 
 def extract_wav_mono16k(video_path: str, out_wav_path: str, sr: int = 16000) -> bool:
@@ -23,3 +28,48 @@ def extract_wav_mono16k(video_path: str, out_wav_path: str, sr: int = 16000) ->
         return os.path.exists(out_wav_path) and os.path.getsize(out_wav_path) > 0
     except Exception:
         return False
+
+def extract_mp3_mono16k_bytes(video_path: str, sr: int = 16000, bitrate: str = "32k",
+                              start_s: float | None = None, length_s: float | None = None) -> bytes | None:
+    """
+    Extrae el audio a MP3 mono `sr` Hz / `bitrate` leyendo el stdout de ffmpeg (pipe:1).
+    Whisper remuestrea a 16 kHz mono de todos modos; a 32 kbps son ~240 KB por minuto.
+    Con `start_s`/`length_s` extrae sólo ese tramo.
+
+    Returns:
+        bytes del MP3, o None en fallo / video sin pista de audio.
+    """
+
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if start_s is not None:
+        cmd += ["-ss", str(start_s)]
+    cmd += ["-i", video_path]
+    if length_s is not None:
+        cmd += ["-t", str(length_s)]
+    cmd += ["-vn", "-ac", "1", "-ar", str(sr), "-b:a", bitrate, "-f", "mp3", "pipe:1"]
+    try:
+        proc = subprocess.run(cmd, check=True, capture_output=True)
+        return proc.stdout or None
+    except Exception:
+        return None
+
+def extract_mp3_segments(video_path: str, segment_s: int = 600, sr: int = 16000, bitrate: str = "32k",
+                         max_workers: int = 4, duration_s: float | None = None) -> list[bytes]:
+    """
+    Igual que `extract_mp3_mono16k_bytes` pero en tramos de `segment_s` segundos (en orden),
+    extraídos en paralelo. Cada tramo queda muy por debajo del límite de 25 MB de Whisper.
+    `duration_s` evita re-probar el contenedor si el llamador ya la conoce.
+    """
+
+    duration = get_duration_s(video_path) if duration_s is None else duration_s
+    if duration <= segment_s:
+        audio = extract_mp3_mono16k_bytes(video_path, sr=sr, bitrate=bitrate)
+        return [audio] if audio else []
+
+    starts = list(range(0, int(math.ceil(duration)), segment_s))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(starts))) as pool:
+        parts = list(pool.map(
+            lambda st: extract_mp3_mono16k_bytes(video_path, sr=sr, bitrate=bitrate, start_s=st, length_s=segment_s),
+            starts,
+        ))
+    return [p for p in parts if p]
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 """
@@ -7,25 +8,33 @@ Selector de ASR:
 - Si no, retorna None (placeholder para ASR local a futuro).
 """
 
-def transcribe_audio(audio_path: str) -> Optional[str]:
+def transcribe_audio(audio: str | bytes, filename: str = "audio.mp3") -> Optional[str]:
     """
-    Transcribe `audio_path` a texto (si hay config).
+    Transcribe `audio` a texto (si hay config).
+    `audio` puede ser una ruta a archivo o el contenido en memoria (se sube como `filename`).
 
     Returns:
         str con la transcripción, o None si falla/no configurado.
     """
 
     use_openai = os.getenv("OPENAI_API_KEY") is not None
-    if not os.path.exists(audio_path):
+    if not audio:
+        return None
+    if isinstance(audio, str) and not os.path.exists(audio):
         return None
 
     if use_openai:
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            with open(audio_path, "rb") as f:
+            from app.infrastructure.nlp.openai_client import get_openai_client
+            client = get_openai_client()
+            if isinstance(audio, str):
+                with open(audio, "rb") as f:
+                    transcript = client.audio.transcriptions.create(
+                        model="whisper-1", file=f, response_format="text"
+                    )
+            else:
                 transcript = client.audio.transcriptions.create(
-                    model="whisper-1", file=f, response_format="text"
+                    model="whisper-1", file=(filename, bytes(audio)), response_format="text"
                 )
             return transcript
         except Exception as e:
@@ -33,3 +42,21 @@ def transcribe_audio(audio_path: str) -> Optional[str]:
             return None
 
     return None
+
+def transcribe_segments(segments: list[bytes], max_workers: int = 4) -> Optional[str]:
+    """
+    Transcribe tramos de audio en paralelo (una llamada a Whisper por tramo) y une los textos
+    en orden. La latencia queda en la del tramo más lento, no en la suma.
+
+    Returns:
+        str con la transcripción completa, o None si ningún tramo se pudo transcribir.
+    """
+
+    if not segments:
+        return None
+    if len(segments) == 1:
+        return transcribe_audio(segments[0])
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(segments))) as pool:
+        texts = list(pool.map(transcribe_audio, segments))
+    texts = [t.strip() for t in texts if t]
+    return " ".join(texts) if texts else None
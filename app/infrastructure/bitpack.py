@@ -3,15 +3,24 @@ import numpy as np
 def pack_phash64(bits_u8: np.ndarray) -> bytes:
     """bits_u8: shape (64,), valores 0/1 uint8 -> 8 bytes."""
 
-    b = np.packbits(bits_u8.astype(np.uint8), bitorder="big")
+    b = np.packbits(np.asarray(bits_u8), bitorder="big")
     return b.tobytes()
 
+def pack_phash64_u64(h: int) -> bytes:
+    """pHash64 como int de 64 bits -> los mismos 8 bytes (big-endian) que `pack_phash64`."""
+
+    return int(h).to_bytes(8, "big")
+
 def unpack_phash64(data: bytes) -> np.ndarray:
     """8 bytes -> (64,) uint8 0/1."""
 
     arr = np.frombuffer(data, dtype=np.uint8)
-    bits = np.unpackbits(arr, bitorder="big")[:64].astype(np.uint8)
-    return bits
+    return np.unpackbits(arr, count=64, bitorder="big")
+
+def phash64_to_u64(data: bytes) -> int:
+    """8 bytes empaquetados (big-endian) -> int de 64 bits (Hamming = `(a ^ b).bit_count()`)."""
+
+    return int.from_bytes(data[:8], "big")
 
 def pack_bool_bits(mat_bool: np.ndarray) -> bytes:
     """
@@ -19,13 +28,27 @@ def pack_bool_bits(mat_bool: np.ndarray) -> bytes:
     cols normalmente 64.
     """
 
-    flat = mat_bool.astype(np.uint8).reshape(-1)
-    b = np.packbits(flat, bitorder="big")
+    # packbits acepta bool directamente: sin la copia intermedia a uint8.
+    b = np.packbits(np.asarray(mat_bool).reshape(-1), bitorder="big")
     return b.tobytes()
 
+def pack_rows_u64_bytes(rows_u64: np.ndarray) -> bytes:
+    """
+    uint64[rows] (una fila de 64 bits por entero) -> mismos bytes que `pack_bool_bits` con cols=64.
+    Sólo escribe los enteros en big-endian; inversa de `unpack_rows_u64`.
+    """
+
+    return np.asarray(rows_u64, dtype=">u8").tobytes()
+
 def unpack_bool_bits(data: bytes, rows: int, cols: int) -> np.ndarray:
     """bytes -> (rows, cols) bool."""
 
     arr = np.frombuffer(data, dtype=np.uint8)
-    bits = np.unpackbits(arr, bitorder="big")[: rows * cols]
-    return bits.reshape(rows, cols).astype(bool)
+    bits = np.unpackbits(arr, count=rows * cols, bitorder="big")
+    # 0/1 uint8 -> bool sin copia (mismo itemsize).
+    return bits.reshape(rows, cols).view(bool)
+
+def unpack_rows_u64(data: bytes, rows: int) -> np.ndarray:
+    """bytes de (rows, 64) bits empaquetados -> uint64[rows] (una fila = un entero, sin desempaquetar)."""
+
+    return np.frombuffer(data, dtype=">u8", count=rows).astype(np.uint64)
@@ -0,0 +1,92 @@
+import hashlib, threading, time
+from collections import OrderedDict
+
+"""
+Cache en proceso indexado por el CONTENIDO del video (no por URL).
+- La misma pieza bajo otra URL (CDN, URL firmada, reposteo) reutiliza huellas y resumen VLM.
+- LRU acotado y thread-safe (los candidates se procesan en paralelo).
+"""
+
+def content_key(path: str, chunk_size: int = 1 << 20) -> str:
+    """BLAKE2b (128 bits) del archivo completo, leído en bloques de `chunk_size`."""
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def text_key(text: str) -> str:
+    """BLAKE2b (128 bits) de un texto (p.ej. el brief de campaña) para componer claves de cache."""
+
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+class LRUCache:
+    """Mapa LRU acotado a `maxsize` entradas, seguro entre hilos."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+class TTLCache(LRUCache):
+    """LRUCache cuyas entradas expiran `ttl_s` segundos después de guardarse."""
+
+    def __init__(self, maxsize: int = 256, ttl_s: float = 60.0):
+        super().__init__(maxsize=maxsize)
+        self.ttl_s = ttl_s
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            self.pop(key)
+            return default
+        return value
+
+    def set(self, key, value) -> None:
+        super().set(key, (time.monotonic() + self.ttl_s, value))
+
+    def pop(self, key, default=None):
+        entry = super().pop(key)
+        return default if entry is None else entry[1]
+
+def memoized(cache: LRUCache, key, fn, *args, **kwargs):
+    """Devuelve `cache[key]` o calcula `fn(*args, **kwargs)` y lo guarda (None no se cachea)."""
+
+    value = cache.get(key)
+    if value is None:
+        value = fn(*args, **kwargs)
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+# content_key -> pHash64 (int) / secuencia (uint64[M]) con los parámetros fijos del servicio
+FINGERPRINT_CACHE = LRUCache(maxsize=512)
+SEQUENCE_CACHE = LRUCache(maxsize=512)
+# content_key -> duración en segundos (ffprobe una sola vez por contenido)
+DURATION_CACHE = LRUCache(maxsize=512)
+# (content_key, image_detail) -> resumen VLM del video base
+SUMMARY_CACHE = LRUCache(maxsize=256)
+# (content_key, image_detail, text_key(brief)) -> veredicto del juez ya parseado
+ALIGNMENT_CACHE = LRUCache(maxsize=1024)
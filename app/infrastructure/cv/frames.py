@@ -0,0 +1,77 @@
+import cv2
+
+"""
+Lectura de frames compartida por huellas (pHash/secuencia) y keyframes del VLM.
+- Abre con backend FFmpeg pidiendo decodificación por hardware si el build la soporta.
+- Lectura secuencial: grab() para saltar frames y retrieve() sólo en los muestreados
+  (sin seeks por timestamp, que fuerzan re-sincronizar en keyframes).
+"""
+
+def open_capture(path: str):
+    """
+    Abre `path` con FFmpeg + aceleración HW (VIDEO_ACCELERATION_ANY).
+    Si falla (build sin soporte), cae al backend por defecto.
+    """
+
+    cap = cv2.VideoCapture(
+        path, cv2.CAP_FFMPEG,
+        [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+    )
+    if not cap.isOpened():
+        cap.release()
+        cap = cv2.VideoCapture(path)
+    # Lectura de archivo local: no hace falta la cola interna de frames.
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+def capture_meta(cap, default_fps: float = 30.0):
+    """(fps, total_frames, duration_s) leídos del contenedor (duration 0 si desconocida)."""
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or default_fps
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    duration = (total / fps) if fps > 0 else 0
+    return fps, total, duration
+
+def frames_at_indices(cap, targets):
+    """
+    Genera (idx, frame_bgr) para cada índice de `targets` (ascendentes).
+    Se detiene en el primer fallo de lectura (fin de stream o archivo corrupto).
+    """
+
+    pos = 0
+    for target in targets:
+        ok = True
+        while ok and pos <= target:
+            ok = cap.grab()
+            pos += 1
+        if not ok:
+            return
+        ok, frame = cap.retrieve()
+        if not ok:
+            return
+        yield target, frame
+
+def interval_targets(fps: float, duration: float, interval_s: float, max_frames: int) -> list[int]:
+    """Índices de frame cada `interval_s` segundos (hasta `max_frames` o `duration` si se conoce)."""
+
+    targets = []
+    for k in range(max_frames):
+        t = k * interval_s
+        if duration and t > duration:
+            break
+        targets.append(int(round(t * fps)))
+    return targets
+
+def frames_at_interval(path: str, interval_s: float, max_frames: int):
+    """Genera frames BGR cada `interval_s` segundos (hasta `max_frames` o fin del video)."""
+
+    cap = open_capture(path)
+    if not cap.isOpened():
+        return
+    try:
+        fps, _total, duration = capture_meta(cap)
+        targets = interval_targets(fps, duration, interval_s, max_frames)
+        for _, frame in frames_at_indices(cap, targets):
+            yield frame
+    finally:
+        cap.release()
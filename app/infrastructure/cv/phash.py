@@ -1,61 +1,152 @@
 import cv2
 import numpy as np
 
+from itertools import takewhile
+
+from app.infrastructure.cv.frames import (
+    frames_at_interval, open_capture, capture_meta, frames_at_indices, interval_targets,
+)
+
 """
 Huella visual global (64 bits) mediante dHash por voto mayoritario sobre frames muestreados.
 Útil como filtro rápido de duplicados exactos/casi-exactos.
 """
 
-def _dhash(image_bgr, hash_size=8):
-    """Calcula dHash (64 bits) de una imagen BGR (bool flatten)."""
+def _shrink_gray(image_bgr, hash_size=8):
+    """
+    Gris + resize a (hash_size, hash_size+1): lo único que necesita el dHash de un frame.
+    El orden (gris y luego resize) es parte de la huella: invertirlo cambia bits respecto
+    de las huellas ya guardadas en `video_features`.
+    """
 
     gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
-    diff = resized[:, 1:] > resized[:, :-1]
-    return diff.flatten()
+    return cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+
+def dhash_batch(small_gray: np.ndarray) -> np.ndarray:
+    """
+    (N, 8, 9) uint8 -> uint64[N]: dHash de todos los frames en una sola comparación, cada uno
+    empaquetado en un entero de 64 bits (mismo orden de bits que `bitpack`).
+    """
+
+    diff = small_gray[:, :, 1:] > small_gray[:, :, :-1]
+    return pack_rows_u64(diff.reshape(small_gray.shape[0], -1))
 
-def _hamming(a: np.ndarray, b: np.ndarray) -> int:
-    """Distancia Hamming entre dos vectores binarios."""
+def _dhash(image_bgr, hash_size=8) -> int:
+    """Calcula dHash (64 bits) de una imagen BGR como int."""
 
+    return int(dhash_batch(_shrink_gray(image_bgr, hash_size)[None])[0])
+
+def frame_hashes(path: str, seconds_interval: float, max_frames: int, hash_size=8) -> np.ndarray:
+    """
+    dHash de los frames muestreados cada `seconds_interval` -> uint64[N] (un entero por frame).
+    Cada frame sólo se reduce a gris (h, h+1) al decodificar; los hashes se calculan en lote.
+    """
+
+    small = [_shrink_gray(frame, hash_size) for frame in frames_at_interval(path, seconds_interval, max_frames)]
+    if not small:
+        return np.zeros(0, dtype=np.uint64)
+    return dhash_batch(np.stack(small))
+
+def _hamming(a, b) -> int:
+    """
+    Distancia Hamming. Para pHash64 empaquetados (int / np.uint64) es un XOR + popcount;
+    para vectores binarios (formato anterior) compara elemento a elemento.
+    """
+
+    if isinstance(a, (int, np.integer)) and isinstance(b, (int, np.integer)):
+        return (int(a) ^ int(b)).bit_count()
     return int(np.count_nonzero(a != b))
 
-def video_fingerprint(path: str, seconds_interval: float = 5.0, max_frames: int = 20):
+def pack_rows_u64(bits: np.ndarray) -> np.ndarray:
+    """
+    bool/0-1[K, 64] -> uint64[K]: cada fila de 64 bits en un entero (bit 0 = MSB, igual que
+    `bitpack`). La distancia Hamming pasa a ser `np.bitwise_count(a ^ b)`.
+    """
+
+    packed = np.packbits(np.asarray(bits).reshape(-1, 64), axis=1, bitorder="big")
+    return packed.view(">u8").ravel().astype(np.uint64)
+
+def similarity_percent_many(fp_u64: int, fps_u64: np.ndarray) -> np.ndarray:
+    """
+    `similarity_percent` del pHash64 `fp_u64` contra toda una columna `fps_u64` (uint64[K])
+    en una pasada: XOR + popcount vectorizados, mismo redondeo que la versión escalar.
+    """
+
+    dist = np.bitwise_count(fps_u64 ^ np.uint64(fp_u64))
+    return np.round(100.0 * (1.0 - dist / 64.0), 2)
+
+def phash_similarity_u64(a: int | None, b: int | None) -> float:
+    """`similarity_percent` para pHash64 ya empaquetados como int: un XOR + popcount."""
+
+    if a is None or b is None:
+        return 0.0
+    return round(100.0 * (1.0 - _hamming(a, b) / 64.0), 2)
+
+def video_fingerprint(path: str, seconds_interval: float = 5.0, max_frames: int = 20) -> int | None:
     """
-    pHash "mayoritario" de un video (64 bits 0/1 en np.uint8).
+    pHash "mayoritario" de un video como int de 64 bits (None si no hay frames).
     Muestra `max_frames` espaciados `seconds_interval` y vota bit a bit.
     """
 
-    cap = cv2.VideoCapture(path)
-    if not cap.isOpened():
-        return None
+    return _majority_vote(frame_hashes(path, seconds_interval, max_frames))
+
+def _majority_vote(hashes_u64: np.ndarray) -> int | None:
+    """uint64[N] -> int de 64 bits con el voto bit a bit (None si no hay frames)."""
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    total = int(cv2.CAP_PROP_FRAME_COUNT and cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    duration = (total / fps) if fps > 0 else 0
-
-    hashes = []
-    t = 0.0
-    while len(hashes) < max_frames and (duration == 0 or t <= duration):
-        cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000.0)
-        ok, frame = cap.read()
-        if not ok:
-            break
-        hashes.append(_dhash(frame))
-        t += seconds_interval
-
-    cap.release()
-    if not hashes:
+    n = len(hashes_u64)
+    if n == 0:
         return None
 
-    arr = np.stack(hashes).astype(np.int8)
-    votes = arr.sum(axis=0) >= (arr.shape[0] / 2.0)
-    return votes.astype(np.uint8)
+    # Conteo por posición de bit sobre los N hashes (bytes big-endian -> bits en orden MSB).
+    bits = np.unpackbits(hashes_u64.astype(">u8").view(np.uint8).reshape(n, 8), axis=1)
+    votes = 2 * bits.sum(axis=0, dtype=np.int32) >= n
+    return int(pack_rows_u64(votes)[0])
+
+def fingerprint_and_sequence(path: str,
+                             fp_interval: float = 5.0, fp_max_frames: int = 20,
+                             seq_interval: float = 2.0, seq_max_frames: int = 60,
+                             hash_size=8):
+    """
+    `video_fingerprint` + `frame_hash_sequence` en UNA sola decodificación: se leen los frames
+    de ambos calendarios (unión de índices), cada uno se reduce una vez y se reparte.
+
+    Returns:
+        (pHash64 como int | None, secuencia uint64[M])
+    """
+
+    small = {}
+    cap = open_capture(path)
+    if cap.isOpened():
+        try:
+            fps, _total, duration = capture_meta(cap)
+            fp_targets = interval_targets(fps, duration, fp_interval, fp_max_frames)
+            seq_targets = interval_targets(fps, duration, seq_interval, seq_max_frames)
+            for idx, frame in frames_at_indices(cap, sorted(set(fp_targets) | set(seq_targets))):
+                small[idx] = _shrink_gray(frame, hash_size)
+        finally:
+            cap.release()
+    if not small:
+        return None, np.zeros(0, dtype=np.uint64)
+
+    def hashes_for(targets):
+        # Igual que la lectura por calendario: corta en el primer frame que no se pudo leer.
+        frames = [small[i] for i in takewhile(small.__contains__, targets)]
+        if not frames:
+            return np.zeros(0, dtype=np.uint64)
+        return dhash_batch(np.stack(frames))
+
+    return _majority_vote(hashes_for(fp_targets)), hashes_for(seq_targets)
 
 def similarity_percent(fp1, fp2) -> float:
-    """Similitud en % = 100 - Hamming% (recorta a la longitud mínima si difieren)."""
+    """
+    Similitud en % = 100 - Hamming%. Acepta pHash64 como int (XOR + popcount) o vectores
+    binarios (recorta a la longitud mínima si difieren).
+    """
 
     if fp1 is None or fp2 is None:
         return 0.0
+    if isinstance(fp1, (int, np.integer)) and isinstance(fp2, (int, np.integer)):
+        return round(100.0 * (1.0 - _hamming(fp1, fp2) / 64.0), 2)
     if fp1.shape[0] != fp2.shape[0]:
         n = min(fp1.shape[0], fp2.shape[0])
         fp1 = fp1[:n]
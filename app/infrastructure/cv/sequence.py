@@ -1,5 +1,9 @@
+import subprocess
 import cv2
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.infrastructure.cv.phash import frame_hashes, pack_rows_u64
 
 """
 Huella de secuencia: dHash por frame muestreado uniformemente.
@@ -7,7 +11,20 @@ Diseñada para near-duplicates con trims/speedup usando ventana de alineación t
 """
 
 def get_duration_s(path: str) -> float:
-    """Duración del video en segundos (0 si FPS inválido)."""
+    """
+    Duración del video en segundos (0 si no se puede determinar).
+    Lee la metadata del contenedor con ffprobe (sin abrir decoder); fallback a OpenCV.
+    """
+
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, text=True, timeout=10, check=True,
+        ).stdout.strip()
+        return float(out)
+    except Exception:
+        pass
 
     cap = cv2.VideoCapture(path)
     fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
@@ -17,51 +34,117 @@ def get_duration_s(path: str) -> float:
 
 def frame_hash_sequence(path: str, seconds_interval: float = 2.0, max_frames: int = 60, hash_size=8):
     """
-    Devuelve bool[M,64] con hashes por frame muestreado cada `seconds_interval`.
+    Devuelve uint64[M]: el dHash (64 bits) de cada frame muestreado cada `seconds_interval`.
     """
 
-    cap = cv2.VideoCapture(path)
-    if not cap.isOpened():
-        return np.array([], dtype=np.bool_)
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    duration = (total / fps) if fps > 0 else 0
-
-    seq = []
-    t = 0.0
-    while len(seq) < max_frames and (duration == 0 or t <= duration):
-        cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000.0)
-        ok, frame = cap.read()
-        if not ok: break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
-        diff = resized[:, 1:] > resized[:, :-1]
-        seq.append(diff.flatten())
-        t += seconds_interval
-    cap.release()
-    return np.array(seq, dtype=np.bool_)
+    return frame_hashes(path, seconds_interval, max_frames, hash_size=hash_size)
 
-def sequence_match_percent(seqA: np.ndarray, seqB: np.ndarray, bit_tolerance: int = 5, window: int = 2):
+def expected_sequence_len(duration_s: float, seconds_interval: float = 2.0, max_frames: int = 60) -> int:
+    """Nº de frames que muestrea `frame_hash_sequence` para un video de `duration_s` (0 = desconocida)."""
+
+    if duration_s <= 0:
+        return max_frames
+    return min(max_frames, int(duration_s // seconds_interval) + 1)
+
+def max_match_percent(len_a: int, len_b: int, window: int = 2) -> float:
     """
-    % de frames de A que encuentran mejor match en B dentro de una ventana temporal ±`window`.
-    Considera match si Hamming <= `bit_tolerance`.
+    Cota superior de `sequence_match_percent(A, B)` conociendo sólo las longitudes:
+    el frame i de A sólo puede matchear si existe j < len_b con |i - j| <= window.
     """
 
-    if seqA.size == 0 or seqB.size == 0:
+    if len_a == 0 or len_b == 0:
+        return 0.0
+    return round(100.0 * min(len_a, len_b + window) / len_a, 2)
+
+def _band_match_percent(dist: np.ndarray, bit_tolerance: int, window: int) -> float:
+    """% de filas de `dist` (M x N) con algún par dentro de ±`window` y Hamming <= `bit_tolerance`."""
+
+    # Los pares fuera de la ventana temporal quedan en 65 (nunca matchean).
+    i = np.arange(dist.shape[0])[:, None]
+    j = np.arange(dist.shape[1])[None, :]
+    dist = np.where(np.abs(i - j) <= window, dist, 65)
+    matches = int(np.count_nonzero(dist.min(axis=1) <= bit_tolerance))
+
+    return round(100.0 * matches / dist.shape[0], 2)
+
+def _band_min_dist(seqA_u64: np.ndarray, stacked: np.ndarray, lens: np.ndarray, window: int) -> np.ndarray:
+    """
+    Mínima distancia Hamming de cada frame i de A contra los frames j = i-window..i+window de
+    cada una de las K secuencias de `stacked` (uint64[K, N], longitudes reales en `lens`).
+
+    B se copia una vez a un buffer con `window` de padding a cada lado y `sliding_window_view`
+    arma sin copiar las ventanas (K, M, 2*window+1): XOR + popcount en una sola operación.
+    Las posiciones fuera de B (padding o más allá de su longitud) quedan en 65 (nunca matchean).
+
+    Returns:
+        uint8[K, M]
+    """
+
+    k, n = stacked.shape
+    m = len(seqA_u64)
+    width = 2 * window + 1
+    take = min(n, m + window)
+    padded = np.zeros((k, m + 2 * window), dtype=np.uint64)
+    valid = np.zeros((k, m + 2 * window), dtype=np.bool_)
+    padded[:, window:window + take] = stacked[:, :take]
+    valid[:, window:window + take] = np.arange(take)[None, :] < lens[:, None]
+
+    wins = sliding_window_view(padded, width, axis=1)
+    dist = np.bitwise_count(seqA_u64[None, :, None] ^ wins)
+    dist = np.where(sliding_window_view(valid, width, axis=1), dist, 65)
+    return dist.min(axis=2)
+
+def sequence_match_percent_packed(seqA_u64: np.ndarray, seqB_u64: np.ndarray, bit_tolerance: int = 5, window: int = 2):
+    """
+    `sequence_match_percent` con cada frame ya empaquetado como uint64 (uint64[M], uint64[N]).
+    Sólo se evalúa la banda |i - j| <= window (ventanas de B, XOR + popcount), no la matriz
+    M x N completa.
+    """
+
+    m, n = len(seqA_u64), len(seqB_u64)
+    if m == 0 or n == 0:
         return 0.0
-    matches = 0
-    for i, hA in enumerate(seqA):
-        start = max(0, i - window)
-        end = min(len(seqB), i + window + 1)
-        best = 65
+    best = _band_min_dist(seqA_u64, np.asarray(seqB_u64, dtype=np.uint64)[None, :], np.array([n]), window)[0]
+    matches = int(np.count_nonzero(best <= bit_tolerance))
+
+    return round(100.0 * matches / m, 2)
 
-        for j in range(start, end):
-            dist = int(np.count_nonzero(hA != seqB[j]))
-            if dist < best:
-                best = dist
+def sequence_match_percent_many(seqA_u64: np.ndarray, seqs_u64: list, bit_tolerance: int = 5, window: int = 2) -> np.ndarray:
+    """
+    `sequence_match_percent_packed(seqA_u64, b)` para cada `b` de `seqs_u64` en una pasada:
+    las K secuencias se apilan en uint64[K, N_max] (con máscara de longitud) y la banda se
+    evalúa para las K a la vez.
+    """
 
-        if best <= bit_tolerance:
-            matches += 1
+    k = len(seqs_u64)
+    m = len(seqA_u64)
+    n_max = max((len(b) for b in seqs_u64), default=0)
+    if m == 0 or n_max == 0:
+        return np.zeros(k, dtype=np.float64)
+    stacked = np.zeros((k, n_max), dtype=np.uint64)
+    lens = np.empty(k, dtype=np.int64)
+    for r, b in enumerate(seqs_u64):
+        stacked[r, :len(b)] = b
+        lens[r] = len(b)
 
-    return round(100.0 * matches / len(seqA), 2)
+    best = _band_min_dist(seqA_u64, stacked, lens, window)
+    matches = np.count_nonzero(best <= bit_tolerance, axis=1)
+
+    return np.round(100.0 * matches / m, 2)
+
+def sequence_match_percent(seqA: np.ndarray, seqB: np.ndarray, bit_tolerance: int = 5, window: int = 2):
+    """
+    % de frames de A que encuentran mejor match en B dentro de una ventana temporal ±`window`.
+    Considera match si Hamming <= `bit_tolerance`. Acepta uint64[M] o bool[M, bits].
+    """
+
+    if seqA.size == 0 or seqB.size == 0:
+        return 0.0
+    # Formato actual de `frame_hash_sequence`: un uint64 por frame.
+    if seqA.ndim == 1 and seqB.ndim == 1:
+        return sequence_match_percent_packed(seqA, seqB, bit_tolerance, window)
+    if seqA.shape[1] == 64 and seqB.shape[1] == 64:
+        return sequence_match_percent_packed(pack_rows_u64(seqA), pack_rows_u64(seqB), bit_tolerance, window)
+    # Hamming de todos los pares (M x N) en una sola pasada vectorizada.
+    dist = np.count_nonzero(seqA[:, None, :] != seqB[None, :, :], axis=-1)
+    return _band_match_percent(dist, bit_tolerance, window)
@@ -1,5 +1,6 @@
 import yt_dlp
 import os
+from urllib.parse import urlparse
 
 """
 Descarga de videos (TikTok/otros) a MP4 con yt_dlp.
@@ -11,6 +12,12 @@ MOBILE_UA = ("Mozilla/5.0 (iPhone; CPU iPhone OS 15_5 like Mac OS X) "
              "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.5 "
              "Mobile/15E148 Safari/604.1")
 
+def _is_tiktok(url: str) -> bool:
+    """True si el host de `url` es tiktok.com o un subdominio (www., vm., m., ...)."""
+
+    host = (urlparse(url).hostname or "").lower()
+    return host == "tiktok.com" or host.endswith(".tiktok.com")
+
 def descargar_video(url, output_folder="videos", size_mb_limit=200, timeout_s=30):
     """
     Descarga `url` a MP4 en `output_folder`.
@@ -23,7 +30,7 @@ def descargar_video(url, output_folder="videos", size_mb_limit=200, timeout_s=30
         os.makedirs(output_folder, exist_ok=True)
 
     outtmpl = os.path.join(output_folder, "%(id)s.%(ext)s")
-    is_tiktok = "tiktok.com" in url.lower()
+    is_tiktok = _is_tiktok(url)
 
     base_opts = {
         "outtmpl": outtmpl,
@@ -37,7 +44,8 @@ def descargar_video(url, output_folder="videos", size_mb_limit=200, timeout_s=30
             "User-Agent": MOBILE_UA if is_tiktok else None,
             "Referer": "https://www.tiktok.com/" if is_tiktok else None,
         },
-        "file_size_limit": size_mb_limit * 1024 * 1024,
+        # yt_dlp aborta la descarga si el tamaño (declarado o acumulado) supera el límite.
+        "max_filesize": size_mb_limit * 1024 * 1024,
         "socket_timeout": timeout_s,
         "verbose": False,
     }
@@ -1,5 +1,6 @@
-import os, json
-from openai import OpenAI
+import orjson
+
+from app.infrastructure.nlp.openai_client import get_openai_client
 
 """
 Juez de alineación:
@@ -23,9 +24,10 @@ def comparar_descripcion_con_resumen_ia(descripcion: str, resumen, umbral_aproba
         JSON string con {match_percent, aproved, reasons}.
     """
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_openai_client()
     if isinstance(resumen, dict):
-        resumen_str = json.dumps(resumen, ensure_ascii=False)
+        # orjson emite UTF-8 sin escapar (como ensure_ascii=False) y sin espacios: menos tokens.
+        resumen_str = orjson.dumps(resumen).decode()
     else:
         resumen_str = str(resumen)
 
@@ -1,30 +1,34 @@
-import os, math
-from openai import OpenAI
+import numpy as np
+
+from app.infrastructure.nlp.openai_client import get_openai_client
 
 """
 Helpers de embeddings y coseno (por si luego usas búsqueda semántica).
 """
 
-_client = None
-def _client_once():
-    """Singleton de OpenAI client para no reconstruir por llamada."""
-
-    global _client
-    if _client is None:
-        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _client
-
 def embed_text(text: str, model: str = "text-embedding-3-large"):
     """Retorna vector embedding para `text`."""
 
-    client = _client_once()
-    resp = client.embeddings.create(model=model, input=text)
-    return resp.data[0].embedding
+    return embed_texts([text], model=model)[0]
+
+def embed_texts(texts: list[str], model: str = "text-embedding-3-large"):
+    """
+    Embeddings de varios textos en UNA sola llamada (el endpoint acepta lista).
+    Devuelve los vectores en el mismo orden que `texts`, como np.float32 normalizados (L2 = 1):
+    mitad de memoria que listas/float64 y el coseno entre ellos es un solo producto punto.
+    """
+
+    if not texts:
+        return []
+    client = get_openai_client()
+    resp = client.embeddings.create(model=model, input=texts)
+    E = np.asarray([d.embedding for d in sorted(resp.data, key=lambda d: d.index)], dtype=np.float32)
+    E /= np.linalg.norm(E, axis=1, keepdims=True) + 1e-12
+    return list(E)
 
 def cosine(a, b):
-    """Similitud de coseno entre dos vectores."""
+    """Similitud de coseno entre dos vectores (float32: un solo sdot de BLAS por producto)."""
 
-    dot = sum(x*y for x, y in zip(a, b))
-    na = math.sqrt(sum(x*x for x in a))
-    nb = math.sqrt(sum(x*x for x in b))
-    return dot / (na * nb + 1e-12)
\ No newline at end of file
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
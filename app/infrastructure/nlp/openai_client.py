@@ -0,0 +1,66 @@
+import os, threading, time
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+
+from app.infrastructure.settings import get_settings
+
+"""
+Cliente OpenAI compartido (uno por proceso) para VLM, juez, embeddings, Whisper y guiones.
+- Un solo pool httpx con keep-alive: las llamadas reutilizan conexiones (sin TLS/DNS por request).
+- Reintentos del SDK con backoff exponencial + jitter ante 429, errores de conexión y 5xx.
+- Token bucket opcional (OPENAI_RPM) aplicado a cada request HTTP, incluidos los reintentos,
+  para no disparar 429 cuando hay llamadas en paralelo.
+"""
+
+class _TokenBucket:
+    """Token bucket thread-safe: `rate_per_min` requests/min con ráfaga de hasta `rate_per_min`."""
+
+    def __init__(self, rate_per_min: int):
+        self.capacity = float(max(1, rate_per_min))
+        self._rate_s = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloquea hasta que haya un token disponible y lo consume."""
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self._rate_s)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self._rate_s
+            time.sleep(wait)
+
+_client: OpenAI | None = None
+_lock = threading.Lock()
+
+def get_openai_client() -> OpenAI:
+    """Singleton del cliente OpenAI configurado desde Settings."""
+
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                s = get_settings()
+                hooks = {}
+                if s.OPENAI_RPM > 0:
+                    bucket = _TokenBucket(s.OPENAI_RPM)
+                    hooks = {"request": [lambda _request: bucket.acquire()]}
+                _client = OpenAI(
+                    api_key=s.OPENAI_API_KEY or os.getenv("OPENAI_API_KEY"),
+                    max_retries=s.OPENAI_MAX_RETRIES,
+                    timeout=s.OPENAI_TIMEOUT_S,
+                    http_client=DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=s.OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=s.OPENAI_MAX_KEEPALIVE,
+                        ),
+                        event_hooks=hooks,
+                    ),
+                )
+    return _client
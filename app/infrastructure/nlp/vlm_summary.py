@@ -1,6 +1,8 @@
 import os, base64, json, subprocess, tempfile
 import cv2
-from openai import OpenAI
+import orjson
+from app.infrastructure.cv.frames import open_capture, capture_meta, frames_at_indices
+from app.infrastructure.nlp.openai_client import get_openai_client
 
 """
 Resumen visual del video (sin ASR):
@@ -8,39 +10,56 @@ Resumen visual del video (sin ASR):
 - Modo 'hybrid': devuelve JSON con narrative + listas + layout_hints.
 """
 
-def _uniform_keyframes(video_path: str, max_frames: int = 16, scale=640):
+def _fit_within(frame, max_side: int):
+    """Reduce `frame` para que su lado mayor sea <= `max_side` (nunca amplía)."""
+
+    h, w = frame.shape[:2]
+    ratio = max_side / float(max(h, w))
+    if ratio >= 1.0:
+        return frame
+    return cv2.resize(frame, (int(w * ratio), int(h * ratio)), interpolation=cv2.INTER_AREA)
+
+def _iter_keyframes(video_path: str, max_frames: int = 16, max_side: int = 768):
     """
-    Extrae frames uniformes, reescala y comprime a JPEG base64 (calidad ~65).
-    Devuelve lista[str base64] de hasta `max_frames`.
+    Genera frames uniformes como JPEG crudo (bytes), reescalados (lado mayor <= `max_side`)
+    y comprimidos a calidad ~65. Hasta `max_frames`.
+
+    gpt-4o re-escala cada imagen a <=768 px en el lado corto y cobra por tiles de 512 px:
+    un vertical 1080x1920 a 432x768 son 2 tiles (antes 640x1138, 6 tiles) y un JPEG más chico.
     """
 
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    step = max(1, total // max_frames) or 1
-    idx = 0
-    while len(frames) < max_frames:
-        ok, frame = cap.read()
-        if not ok: break
-        if idx % step == 0:
-            h, w = frame.shape[:2]
-            new_w = scale
-            new_h = int(h * (scale / w))
-            resized = cv2.resize(frame, (new_w, new_h))
+    cap = open_capture(video_path)
+    try:
+        _fps, total, _duration = capture_meta(cap)
+        step = max(1, total // max_frames) or 1
+        # Sin FRAME_COUNT (total=0) se toman los primeros `max_frames` frames, como antes.
+        targets = range(0, total, step)[:max_frames] if total else range(max_frames)
+        for _, frame in frames_at_indices(cap, targets):
+            resized = _fit_within(frame, max_side)
             _, buf = cv2.imencode(".jpg", resized, [int(cv2.IMWRITE_JPEG_QUALITY), 65])
-            frames.append(base64.b64encode(buf.tobytes()).decode("utf-8"))
-        idx += 1
-    cap.release()
-    return frames
+            yield buf.tobytes()
+    finally:
+        cap.release()
+
+def _uniform_keyframes(video_path: str, max_frames: int = 16, max_side: int = 768) -> list[bytes]:
+    """`_iter_keyframes` materializado (para pasarlo entre hilos); JPEG crudo, sin base64."""
+
+    return list(_iter_keyframes(video_path, max_frames=max_frames, max_side=max_side))
 
-def analyze_video_free_narrative(video_path: str, transcript_text: str | None = None, max_frames: int = 16) -> str:
+def to_data_url(jpeg: bytes) -> str:
+    """JPEG crudo -> data-URL base64: la única codificación, justo al armar el mensaje."""
+
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+
+def analyze_video_free_narrative(video_path: str, transcript_text: str | None = None, max_frames: int = 16,
+                                 image_detail: str = "auto") -> str:
     """
     Prompt de narrativa libre (120–200 palabras) con frames + texto opcional.
     Usa gpt-4o con mensajes de tipo `image_url` (data-URL base64).
     """
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    frames = _uniform_keyframes(video_path, max_frames=max_frames)
+    client = get_openai_client()
+    frames = _iter_keyframes(video_path, max_frames=max_frames)
 
     messages = [{
         "role":"user",
@@ -56,7 +75,7 @@ def analyze_video_free_narrative(video_path: str, transcript_text: str | None =
     }]
 
     for f in frames:
-        messages[0]["content"].append({"type":"image_url","image_url":{"url":f"data:image/jpeg;base64,{f}"}})
+        messages[0]["content"].append({"type":"image_url","image_url":{"url":to_data_url(f),"detail":image_detail}})
 
     if transcript_text:
         messages[0]["content"].append({"type":"text","text":f"TEXTO/TRANSCRIPCIÓN:\n{transcript_text[:8000]}"})
@@ -69,11 +88,12 @@ def analyze_video_free_narrative(video_path: str, transcript_text: str | None =
     )
     return resp.choices[0].message.content.strip()
 
-def analyze_video_hybrid(video_path: str, transcript_text: str | None = None, max_frames: int = 16) -> dict:
+def analyze_video_hybrid(video_path: str, transcript_text: str | None = None, max_frames: int = 16,
+                         image_detail: str = "auto") -> dict:
     """Normaliza a texto compacto: si dict, concatena narrative + layout_hints; si str, trunca."""
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    frames = _uniform_keyframes(video_path, max_frames=max_frames)
+    client = get_openai_client()
+    frames = _iter_keyframes(video_path, max_frames=max_frames)
 
     messages = [{
         "role": "user",
@@ -91,7 +111,7 @@ def analyze_video_hybrid(video_path: str, transcript_text: str | None = None, ma
     }]
 
     for f in frames:
-        messages[0]["content"].append({"type":"image_url","image_url":{"url":f"data:image/jpeg;base64,{f}"}})
+        messages[0]["content"].append({"type":"image_url","image_url":{"url":to_data_url(f),"detail":image_detail}})
 
     if transcript_text:
         messages[0]["content"].append({"type":"text","text":f"TEXTO/TRANSCRIPCIÓN (opcional):\n{transcript_text[:8000]}"})
@@ -103,7 +123,7 @@ def analyze_video_hybrid(video_path: str, transcript_text: str | None = None, ma
         max_tokens=1400,
         temperature=0.1
     )
-    data = json.loads(resp.choices[0].message.content)
+    data = orjson.loads(resp.choices[0].message.content)
     data.setdefault("narrative","")
     for k in ["events","people","objects","locations","topics","heard_phrases"]:
         if k not in data or not isinstance(data[k], list):
@@ -132,8 +152,14 @@ def summarize_video_textual(summary) -> str:
                      f"subtitles.lang={lh.get('subtitles',{}).get('language','desconocido')}")
     return "\n".join(parts)[:6000]
 
-def analyze_frames_free_narrative(frames_b64: list[str], transcript_text: str | None = None) -> str:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def analyze_frames_free_narrative(frames: list[bytes], transcript_text: str | None = None,
+                                  image_detail: str = "auto") -> str:
+    """
+    Narrativa libre a partir de keyframes JPEG (bytes) ya extraídos; se codifican a base64
+    uno a uno al armar el mensaje.
+    `image_detail` ("low" | "high" | "auto") controla el costo en tokens por frame de gpt-4o.
+    """
+    client = get_openai_client()
     messages = [{
         "role": "user",
         "content": [
@@ -146,9 +172,9 @@ def analyze_frames_free_narrative(frames_b64: list[str], transcript_text: str |
             {"type":"text","text":"Fotogramas representativos:"}
         ]
     }]
-    for b64 in frames_b64:
+    for jpeg in frames:
         messages[0]["content"].append({
-            "type":"image_url", "image_url":{"url": f"data:image/jpeg;base64,{b64}"}
+            "type":"image_url", "image_url":{"url": to_data_url(jpeg), "detail": image_detail}
         })
 
     if transcript_text:
@@ -2,13 +2,23 @@ import os
 from typing import Optional
 from psycopg_pool import ConnectionPool
 
+from app.infrastructure.settings import get_settings
+
 _POOL: Optional[ConnectionPool] = None
 
 def get_pool() -> ConnectionPool:
     global _POOL
     if _POOL is None:
-        dsn = os.getenv("PG_DSN")
+        settings = get_settings()
+        dsn = os.getenv("PG_DSN") or settings.PG_DSN
         if not dsn:
             raise RuntimeError("PG_DSN no definido (exporta PG_DSN o usa Settings.PG_DSN)")
-        _POOL = ConnectionPool(conninfo=dsn, min_size=1, max_size=5, kwargs={"autocommit": True})
+        # Dimensionado para las evaluaciones concurrentes (lookup, recientes, escrituras en
+        # background y cleaner): con un pool chico las consultas hacen cola por conexión.
+        _POOL = ConnectionPool(
+            conninfo=dsn,
+            min_size=settings.PG_POOL_MIN,
+            max_size=max(settings.PG_POOL_MIN, settings.PG_POOL_MAX),
+            kwargs={"autocommit": True},
+        )
     return _POOL
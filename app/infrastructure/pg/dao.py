@@ -1,60 +1,258 @@
 import numpy as np
 from datetime import date
-import os, shutil
+import os, shutil, hashlib, logging, queue, threading, time
 from app.infrastructure.pg.client import get_pool
-from app.infrastructure.bitpack import pack_phash64, pack_bool_bits, unpack_phash64, unpack_bool_bits
+from app.infrastructure.bitpack import (
+    pack_phash64_u64, pack_rows_u64_bytes, phash64_to_u64, unpack_rows_u64,
+)
+from app.infrastructure.content_cache import TTLCache, memoized
+from app.infrastructure.settings import get_settings
 
 """
 DAO de Postgres para `video_features`.
 - Esquema en /app/infrastructure/pg/migrations/001_init.sql
 - Se usa como write-through y como fallback para repoblar Redis.
+- Las sentencias del camino de /evaluate van con `prepare=True`: cada conexión del pool
+  las prepara una vez y luego sólo envía parámetros (sin parse/plan por llamada).
 """
 
+logger = logging.getLogger(__name__)
+
+def video_id_for_url(url: str) -> str:
+    """
+    `video_id` estable derivado de la URL: BLAKE2b de 128 bits (hex).
+    Es sólo una clave (no autentica nada); los registros previos con sha1 siguen siendo válidos.
+    """
+
+    return hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+
+_INSERT_FEATURES_SQL = """
+    INSERT INTO video_features (video_id, campaign_id, url, phash64, seq_sig, seq_rows, seq_cols, duration_s, content_key)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    ON CONFLICT (url) DO NOTHING
+"""
+
+def _features_params(video_id: str, campaign_id: str, url: str, phash64_u64: int, seq_u64: np.ndarray,
+                     duration_s: float, content_key: str | None) -> tuple:
+    """Parámetros de `_INSERT_FEATURES_SQL` (huellas ya empaquetadas a bytes)."""
+
+    return (
+        video_id, campaign_id, url,
+        pack_phash64_u64(phash64_u64),
+        pack_rows_u64_bytes(seq_u64),
+        len(seq_u64), 64, float(duration_s), content_key,
+    )
+
 def pg_save_video_features(video_id: str, campaign_id: str, url: str,
-                           phash64_bits: np.ndarray, seq_bits: np.ndarray,
-                           duration_s: float) -> None:
-    """Inserta (idempotente por URL) las huellas del video."""
+                           phash64_u64: int, seq_u64: np.ndarray,
+                           duration_s: float, content_key: str | None = None) -> None:
+    """
+    Inserta (idempotente por URL) las huellas del video y su clave de contenido.
+    Ambas huellas llegan ya empaquetadas (pHash64 como int, secuencia como uint64[M] con
+    64 bits por frame): se escriben tal cual.
+    """
 
-    rows, cols = seq_bits.shape
+    params = _features_params(video_id, campaign_id, url, phash64_u64, seq_u64, duration_s, content_key)
     with get_pool().connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO video_features (video_id, campaign_id, url, phash64, seq_sig, seq_rows, seq_cols, duration_s)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (url) DO NOTHING
-            """,
-            (
-                video_id, campaign_id, url,
-                pack_phash64(phash64_bits),
-                pack_bool_bits(seq_bits),
-                rows, cols, float(duration_s),
-            )
-        )
+        cur.execute(_INSERT_FEATURES_SQL, params, prepare=True)
 
-def pg_get_by_url(url: str):
-    """Recupera un registro por URL y decodifica phash/seq a np.ndarray."""
+# Escrituras encoladas: un hilo las agrupa y las inserta en lote (una conexión y un
+# round-trip en pipeline por lote en vez de uno por video aprobado).
+# Las URLs encoladas y aún no escritas se recuerdan en `_PENDING_URLS` para que
+# `pg_url_exists` las vea durante la ventana de `PG_SAVE_FLUSH_MS`.
+_SAVE_QUEUE: queue.Queue = queue.Queue()
+_SAVE_FLUSHER: threading.Thread | None = None
+_SAVE_FLUSHER_LOCK = threading.Lock()
+_PENDING_URLS: set[str] = set()
+_PENDING_LOCK = threading.Lock()
+
+def _executemany_features(rows: list[tuple]) -> None:
+    """
+    Inserta `rows` con una conexión del pool en UNA transacción explícita (el pool es
+    autocommit): un lote que falla no queda escrito a medias.
+    """
+
+    with get_pool().connection() as conn, conn.transaction(), conn.cursor() as cur:
+        cur.executemany(_INSERT_FEATURES_SQL, rows)
+
+def _insert_features_batch(batch: list[tuple]) -> None:
+    """
+    `executemany` del lote (psycopg lo envía en modo pipeline). Si falla se reintenta una vez
+    y, si vuelve a fallar, se inserta fila por fila: una fila mala no descarta el resto.
+    """
+
+    try:
+        for attempt in range(2):
+            try:
+                _executemany_features(batch)
+                return
+            except Exception as e:
+                logger.warning("PG save batch error (%d filas, intento %d): %s", len(batch), attempt + 1, e)
+        for row in batch:
+            try:
+                _executemany_features([row])
+            except Exception as e:
+                logger.error("PG save rechazó la fila de %s: %s", row[2], e)
+    finally:
+        with _PENDING_LOCK:
+            _PENDING_URLS.difference_update(row[2] for row in batch)
+
+def _save_flusher_loop(max_rows: int, max_wait_s: float) -> None:
+    """Espera la primera fila y junta hasta `max_rows` o `max_wait_s` antes de escribir."""
+
+    while True:
+        batch = [_SAVE_QUEUE.get()]
+        deadline = time.monotonic() + max_wait_s
+        while len(batch) < max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_SAVE_QUEUE.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _insert_features_batch(batch)
+
+def enqueue_save_video_features(video_id: str, campaign_id: str, url: str,
+                                phash64_u64: int, seq_u64: np.ndarray,
+                                duration_s: float, content_key: str | None = None) -> None:
+    """
+    Como `pg_save_video_features` pero sin esperar a PG: encola la fila y el flusher la
+    inserta en el próximo lote (`PG_SAVE_BATCH_ROWS` filas o `PG_SAVE_FLUSH_MS` ms).
+    """
+
+    global _SAVE_FLUSHER
+    if _SAVE_FLUSHER is None:
+        with _SAVE_FLUSHER_LOCK:
+            if _SAVE_FLUSHER is None:
+                settings = get_settings()
+                _SAVE_FLUSHER = threading.Thread(
+                    target=_save_flusher_loop,
+                    args=(max(1, settings.PG_SAVE_BATCH_ROWS), settings.PG_SAVE_FLUSH_MS / 1000.0),
+                    name="pg-save-flusher", daemon=True,
+                )
+                _SAVE_FLUSHER.start()
+    params = _features_params(video_id, campaign_id, url, phash64_u64, seq_u64, duration_s, content_key)
+    with _PENDING_LOCK:
+        _PENDING_URLS.add(url)
+    _SAVE_QUEUE.put(params)
+
+def pg_flush_pending_saves() -> None:
+    """Escribe en línea lo que siga encolado (apagado ordenado: el flusher es un hilo daemon)."""
+
+    batch = []
+    while True:
+        try:
+            batch.append(_SAVE_QUEUE.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _insert_features_batch(batch)
+
+def pg_get_by_content_key(content_key: str):
+    """
+    Huellas ya calculadas para el MISMO archivo (BLAKE2b del contenido) bajo cualquier URL.
+    Devuelve el registro decodificado (como `pg_get_by_url`) o None.
+    """
 
     with get_pool().connection() as conn, conn.cursor() as cur:
         cur.execute(
-            """
-            SELECT video_id, campaign_id, url, phash64, seq_sig, seq_rows, seq_cols, duration_s
-            FROM video_features WHERE url = %s
-            """,
-            (url,)
+            f"SELECT {_FEATURES_COLS} FROM video_features WHERE content_key = %s LIMIT 1",
+            (content_key,), prepare=True,
         )
         row = cur.fetchone()
     if not row:
         return None
+    return _decode_features_row(row)
+
+# url -> registro decodificado. Sólo se cachean hits (las filas no se actualizan). Los borrados
+# por retención de este proceso invalidan sus URLs; el TTL corto acota lo que sobrevive a un
+# borrado hecho por otro worker.
+_BY_URL_CACHE = TTLCache(maxsize=4096, ttl_s=60.0)
+
+def pg_get_by_url(url: str):
+    """
+    Recupera un registro por URL con phash/seq empaquetados (int / uint64[rows]).
+    Los hits se sirven desde un cache en proceso (candidates repetidos entre evaluaciones).
+    """
+
+    return memoized(_BY_URL_CACHE, url, _pg_get_by_url, url)
+
+_FEATURES_COLS = "video_id, campaign_id, url, phash64, seq_sig, seq_rows, seq_cols, duration_s"
+
+def _decode_features_row(row) -> dict:
+    """
+    Fila de `_FEATURES_COLS` -> dict con las huellas sólo en su forma empaquetada
+    (pHash64 como int, secuencia como uint64[rows]): es lo único que usa el dedupe.
+    """
+
     video_id, campaign_id, url, phash_b, seq_b, rows, cols, duration_s = row
     return {
         "video_id": video_id,
         "campaign_id": campaign_id,
         "url": url,
-        "phash64": unpack_phash64(bytes(phash_b)),
-        "seq_sig": unpack_bool_bits(bytes(seq_b), rows, cols),
+        "phash64_u64": phash64_to_u64(phash_b),
+        "seq_u64": unpack_rows_u64(seq_b, rows),
+        "seq_rows": int(rows),
+        "seq_cols": int(cols),
         "duration_s": float(duration_s),
     }
 
+def _pg_get_by_url(url: str):
+    """Consulta PG por URL y decodifica phash/seq a su forma empaquetada."""
+
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"SELECT {_FEATURES_COLS} FROM video_features WHERE url = %s",
+            (url,), prepare=True,
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    return _decode_features_row(row)
+
+def pg_get_by_urls(urls: list[str]) -> dict:
+    """
+    Versión en lote de `pg_get_by_url`: {url: registro} sólo para las URLs que existen.
+    Lo que no está en el cache en proceso se trae en UNA consulta (`url = ANY(...)`).
+    """
+
+    out = {}
+    missing = []
+    for url in dict.fromkeys(urls):
+        rec = _BY_URL_CACHE.get(url)
+        if rec is None:
+            missing.append(url)
+        else:
+            out[url] = rec
+    if not missing:
+        return out
+
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            f"SELECT {_FEATURES_COLS} FROM video_features WHERE url = ANY(%s)",
+            (missing,), prepare=True,
+        )
+        rows = cur.fetchall()
+    for row in rows:
+        rec = _decode_features_row(row)
+        _BY_URL_CACHE.set(rec["url"], rec)
+        out[rec["url"]] = rec
+    return out
+
+def pg_url_exists(url: str) -> bool:
+    """
+    True si la URL ya tiene features guardadas (sólo índice UNIQUE, sin leer blobs)
+    o está encolada para el próximo lote (aprobada hace menos de `PG_SAVE_FLUSH_MS`).
+    """
+
+    with _PENDING_LOCK:
+        if url in _PENDING_URLS:
+            return True
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM video_features WHERE url = %s", (url,), prepare=True)
+        return cur.fetchone() is not None
+
 def pg_recent_candidates(campaign_id: str, k: int = 50):
     """
     Devuelve SOLO metadatos ligeros de los más recientes:
@@ -87,6 +285,37 @@ def pg_recent_candidates(campaign_id: str, k: int = 50):
         })
     return out
 
+def pg_recent_fingerprints(campaign_id: str, k: int = 50):
+    """
+    Huellas de los `k` videos más recientes de la campaña, listas para el dedupe:
+    pHash64 como int y la secuencia como uint64[rows], directo de los bytes empaquetados
+    (sin desempaquetar a bits).
+    `pg_recent_candidates` queda para listados livianos.
+    """
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT video_id, url, phash64, seq_sig, seq_rows, seq_cols, duration_s
+            FROM video_features
+            WHERE campaign_id = %s
+            ORDER BY created_at DESC
+            LIMIT %s
+            """,
+            (campaign_id, k), prepare=True,
+        )
+        rows = cur.fetchall()
+
+    return [
+        {
+            "video_id": video_id,
+            "url": url,
+            "phash64_u64": phash64_to_u64(phash_b),
+            "seq_u64": unpack_rows_u64(seq_b, rows_),
+            "duration_s": float(duration_s),
+        }
+        for video_id, url, phash_b, seq_b, rows_, cols, duration_s in rows
+    ]
+
 def pg_upsert_campaign_end_date(campaign_id: str, end_date: date) -> None:
     """Crea/actualiza fecha fin para la campaña."""
     with get_pool().connection() as conn, conn.cursor() as cur:
@@ -113,13 +342,16 @@ def pg_expired_campaign_ids(as_of: date):
 def pg_delete_videos_by_campaign(campaign_id: str):
     """
     Borra videos de una campaña y retorna los video_id eliminados (para limpiar FS).
+    Las URLs borradas salen también del cache en proceso de `pg_get_by_url(s)`.
     """
     with get_pool().connection() as conn, conn.cursor() as cur:
         cur.execute(
-            "DELETE FROM video_features WHERE campaign_id = %s RETURNING video_id",
+            "DELETE FROM video_features WHERE campaign_id = %s RETURNING video_id, url",
             (campaign_id,)
         )
         rows = cur.fetchall()
+    for _video_id, url in rows:
+        _BY_URL_CACHE.pop(url)
     return [r[0] for r in rows]
 
 def pg_delete_campaign_retention(campaign_id: str):
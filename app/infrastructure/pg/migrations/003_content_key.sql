@@ -0,0 +1,5 @@
+ALTER TABLE video_features
+  ADD COLUMN IF NOT EXISTS content_key text;
+
+CREATE INDEX IF NOT EXISTS video_features_content_key_idx
+  ON video_features (content_key);
@@ -9,13 +9,24 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = None
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # OpenAI (cliente compartido)
+    OPENAI_MAX_RETRIES: int = 5      # backoff exponencial del SDK ante 429/conexión/5xx
+    OPENAI_TIMEOUT_S: float = 60.0
+    OPENAI_RPM: int = 0              # token bucket por proceso; 0 = sin límite
+    OPENAI_MAX_CONNECTIONS: int = 64     # pool httpx compartido (keep-alive, sin TLS por llamada)
+    OPENAI_MAX_KEEPALIVE: int = 32
+
     # Descarga
     VIDEO_MAX_MB: int = 200
     DL_TIMEOUT_S: int = 30
+    CANDIDATES_CONCURRENCY: int = 4  # descargas/huellas de candidates en paralelo
+    EVALUATE_CONCURRENCY: int = 8    # evaluaciones simultáneas (hilos propios, fuera del threadpool de FastAPI)
+    REQ_TMPFS_DIR: str | None = "/dev/shm"  # MP4 temporales en RAM si hay espacio; None = $TMPDIR
 
     # Resumen VLM
     FRAMES_MAX: int = 20
     FRAME_SCENE_THRESHOLD: float = 0.25
+    VLM_IMAGE_DETAIL: str = "auto"  # "low" (85 tokens/frame) | "high" | "auto"
 
     # Umbrales de dedupe
     HASH_DUP_THRESHOLD: float = 95.0
@@ -39,6 +50,13 @@ class Settings(BaseSettings):
     # PostgreSQL
     PG_ENABLED: bool = False
     PG_DSN: str | None = None
+    PG_POOL_MIN: int = 1
+    PG_POOL_MAX: int = 10  # >= EVALUATE_CONCURRENCY para no encolar lookups
+    # Huellas aprobadas se escriben en lote desde un hilo: durante hasta PG_SAVE_FLUSH_MS una URL
+    # aprobada sólo la ve `pg_url_exists` (no `pg_get_by_urls` / recientes), y lo encolado se
+    # pierde si el proceso muere sin el apagado ordenado del lifespan.
+    PG_SAVE_BATCH_ROWS: int = 100  # huellas aprobadas por INSERT en lote
+    PG_SAVE_FLUSH_MS: int = 200    # espera máxima de una fila encolada antes del lote
 
     # Keyframes cache (FS)
     KEYFRAME_CACHE_ENABLED: bool = True
@@ -47,12 +65,14 @@ class Settings(BaseSettings):
     # Audio / ASR
     AUDIO_ASR_ENABLED: bool = True  # usa Whisper si hay OPENAI_API_KEY
     AUDIO_TARGET_SR: int = 16000
+    ASR_SEGMENT_S: int = 600  # tramos de audio transcritos en paralelo (límite Whisper: 25 MB)
 
     class Config:
         env_file = ".env"
 
     # Borrado Automático de huellas (Postgres)
     CLEANUP_INTERVAL_MIN: int = 60  # corre cada 60 min por defecto
+    CLEANUP_CONCURRENCY: int = 8    # campañas vencidas limpiadas en paralelo
 
 @lru_cache
 def get_settings() -> Settings:
@@ -1,11 +1,13 @@
 import asyncio
 from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.api.http.routers.evaluate import router as evaluate_router
 from app.api.http.routers.dev_features import router as dev_features_router
 from app.api.http.routers.campaign import router as campaign_router
 from app.infrastructure.settings import get_settings
 from app.application.services.retention_cleanup import RetentionCleaner
+from app.infrastructure.pg.dao import pg_flush_pending_saves
 
 """
 Punto de entrada de la app FastAPI.
@@ -18,7 +20,7 @@ async def lifespan(app: FastAPI):
     Reemplaza a @app.on_event('startup'/'shutdown').
 
     - En startup: inicia el cleaner (si PG_ENABLED=True).
-    - En shutdown: cancela y espera el task del cleaner.
+    - En shutdown: cancela y espera el task del cleaner y escribe las huellas aún encoladas.
     """
     settings = get_settings()
     task = None
@@ -36,8 +38,13 @@ async def lifespan(app: FastAPI):
             task.cancel()
             with suppress(asyncio.CancelledError):
                 await task
+        await asyncio.to_thread(pg_flush_pending_saves)
 
-app = FastAPI(title="Inklop IA Service", version="1.0.0", lifespan=lifespan)
+# ORJSONResponse: serialización en C para todas las respuestas (los routers la heredan).
+app = FastAPI(
+    title="Inklop IA Service", version="1.0.0", lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # Rutas públicas y de soporte
 app.include_router(evaluate_router, prefix="/api")
@@ -45,7 +52,7 @@ app.include_router(dev_features_router, prefix="/api")
 app.include_router(campaign_router, prefix="/api")
 
 @app.get("/health", tags=["health"])
-def health():
+async def health():
     """Healthcheck simple para liveness/readiness."""
 
     return {"status": "ok"}
@@ -0,0 +1,27 @@
+import pytest
+from pydantic import HttpUrl, TypeAdapter
+
+from app.api.http.schemas.requests import _check_url
+
+"""
+`FastUrl` debe producir el mismo string que `HttpUrl`: es la clave con la que se
+guardan y buscan las URLs en Postgres.
+"""
+
+_HTTP_URL = TypeAdapter(HttpUrl)
+
+@pytest.mark.parametrize("raw, expected", [
+    ("https://example.com:443/a", "https://example.com/a"),
+    ("https://münchen.de/x", "https://xn--mnchen-3ya.de/x"),
+    ("https://a.com/a b", "https://a.com/a%20b"),
+    ("HTTPS://WWW.TikTok.com", "https://www.tiktok.com/"),
+    ("https://www.tiktok.com/@user/video/123?lang=es", "https://www.tiktok.com/@user/video/123?lang=es"),
+])
+def test_check_url_matches_httpurl(raw, expected):
+    assert _check_url(raw) == expected
+    assert _check_url(raw) == str(_HTTP_URL.validate_python(raw))
+
+@pytest.mark.parametrize("raw", ["ftp://example.com/a", "example.com/a", "https://" + "a" * 2100])
+def test_check_url_rejects_non_http(raw):
+    with pytest.raises(ValueError):
+        _check_url(raw)